@@ -1,33 +1,74 @@
+import time
 from flask import Flask
 from flask_cors import CORS
 from extensions import db
 from config import Config
+from services.database import database
+from services.question_bank import question_bank
+from services.grading_queue import grading_queue
+from services.async_grader import async_grader
+from services.images import image_pipeline
+from services.answer_check import answer_checker
+from services.storage import image_store
+from services.model_backends import model_registry
+from services.ocr_cache import ocr_cache
+from services.preprocess import preprocessor
+from services.verdict_cache import verdict_cache
+from services.rating import rating_engine
+from services.leaderboard import leaderboard
+from services.recommender import question_recommender
+from services.passwords import password_hasher
+from cli import register_commands
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
-app.config.from_object(Config)
-db.init_app(app)
 
-# Import routes after app and db are created
-from routes.user_routes import user_routes
-from routes.problem_routes import problem_routes  # Add this line
+def create_app(config_class=Config):
+    """Builds the Flask app.
 
-# Import models to register them with SQLAlchemy
-from models.user import User
-from models.rating_history import RatingHistory
-from models.problem import Problem, Submission  # Add this line
+    Nothing here talks to the database or the model API: tables are created
+    with `flask --app app init-db`, and the grading graph, model clients and
+    background threads are built on first use, so a preloading server can
+    fork workers straight after this returns.
+    """
+    started = time.perf_counter()
 
-# Create all database tables
-with app.app_context():
-    try:
-        db.create_all()
-        print("Database tables created successfully")
-    except Exception as e:
-        print(f"Error creating database tables: {str(e)}")
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+    app.config.from_object(config_class)
+    database.init_app(app)  # Pool options and replica bind, read by db.init_app
+    db.init_app(app)
+    question_bank.init_app(app)  # Parse questions.json once at startup
+    image_pipeline.init_app(app)
+    image_store.init_app(app)
+    model_registry.init_app(app)
+    ocr_cache.init_app(app)
+    answer_checker.init_app(app)
+    preprocessor.init_app(app)
+    verdict_cache.init_app(app)
+    rating_engine.init_app(app)
+    leaderboard.init_app(app)
+    question_recommender.init_app(app)
+    password_hasher.init_app(app)
+    async_grader.init_app(app)
+    grading_queue.init_app(app)  # Workers start with the first submission
+
+    # Import routes after app and db are created
+    from routes.user_routes import user_routes
+    from routes.problem_routes import problem_routes
+
+    # Import models to register them with SQLAlchemy
+    from models.user import User
+    from models.rating_history import RatingHistory, RatingSummary
+    from models.problem import Problem, Submission
+    from models.stats import ProblemStats, UserStats
+
+    # Register the blueprints
+    app.register_blueprint(user_routes)
+    app.register_blueprint(problem_routes)
+    register_commands(app)
+
+    print(f"App created in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return app
 
-# Register the blueprints
-app.register_blueprint(user_routes)
-app.register_blueprint(problem_routes)  # Add this line
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
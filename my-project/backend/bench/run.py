@@ -0,0 +1,318 @@
+"""Offline load test for the backend API.
+
+Run from my-project/backend:
+
+    python -m bench.run --users 1000 --problems 5000 --requests 500 --concurrency 16
+    python -m bench.run --output bench/results/baseline.json
+    python -m bench.run --baseline bench/results/baseline.json
+
+The app is booted in-process against a throwaway SQLite file (or
+--database-url, e.g. a local MySQL container) and seeded with synthetic
+data. Both model roles use the fake backend. The app is served by a
+threaded WSGI server. Each scenario is driven over HTTP at the given
+concurrency, and throughput and latency percentiles are written as JSON.
+'submit' posts a different photo every time, so storage dedup and the OCR
+cache miss and each submission pays for preprocessing and OCR; the fake OCR
+returns the same text for every photo, so the verdict cache is disabled to
+keep the compare call in the path. 'submit_warm' reposts one photo to
+measure the cached path.
+With --baseline, p95 latency and throughput are compared against a
+saved run, and the exit status is 1 if either regresses beyond --tolerance.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+SCENARIOS = ('login', 'problems', 'questions', 'user', 'submit', 'submit_warm')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the backend API with synthetic data and a fake model.')
+    parser.add_argument('--database-url', help='Defaults to a fresh SQLite file in a temp directory')
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables before seeding')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--problems', type=int, default=1000)
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=10, help='Unrecorded requests per scenario before measuring')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument('--fake-latency', type=float, default=0.05, help='Seconds per fake model call')
+    parser.add_argument('--grading-mode', choices=('threads', 'async'), default='threads')
+    parser.add_argument('--drain-timeout', type=float, default=120, help='Seconds to wait for queued gradings')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Results file (default bench/results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative regression')
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir):
+    # Config reads the environment at import time, so this runs before the app is imported
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    os.environ['QUESTIONS_FILE'] = os.path.join(workdir, 'questions.json')
+    os.environ['STORAGE_ROOT'] = os.path.join(workdir, 'objects')
+    os.environ['OCR_CACHE_DIR'] = os.path.join(workdir, 'ocr-cache')
+    os.environ['OCR_MODEL_BACKEND'] = 'fake'
+    os.environ['COMPARE_MODEL_BACKEND'] = 'fake'
+    os.environ['FAKE_MODEL_LATENCY'] = str(args.fake_latency)
+    os.environ['GRADING_MODE'] = args.grading_mode
+    os.environ['VERDICT_CACHE_TTL'] = '0'  # every fake transcription is identical; real ones are not
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, errors, wall_seconds):
+    latencies = sorted(latencies)
+    ok = sum(count for status, count in statuses.items() if status < 400)
+    return {
+        'requests': len(latencies) + errors,
+        'ok': ok,
+        'errors': errors,
+        'status': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            **{f'p{q}': percentile(latencies, q) for q in (50, 90, 95, 99)},
+            'max': latencies[-1] if latencies else None,
+        },
+    }
+
+
+def multipart(fields, files):
+    """Encodes form fields and (name, filename, bytes) files as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Scenarios:
+    """Builds the (method, path, body, headers) of request i for each scenario."""
+
+    def __init__(self, rng, users, problems, questions, photos):
+        self.rng = rng
+        self.users = users
+        self.problem_count = problems
+        self.question_count = questions
+        self.photos = photos  # one per cold submit, warm-up included, so none repeats
+        self._next_photo = 0
+        self._lock = threading.Lock()  # random.Random is shared by the client threads
+
+    def _pick(self, population):
+        with self._lock:
+            return self.rng.choice(population)
+
+    def _randint(self, low, high):
+        with self._lock:
+            return self.rng.randint(low, high)
+
+    def login(self, i):
+        from bench.seed import PASSWORD
+        _, username = self._pick(self.users)
+        body = json.dumps({'username': username, 'password': PASSWORD}).encode()
+        return 'POST', '/auth/login', body, {'Content-Type': 'application/json'}
+
+    def problems(self, i):
+        after = self._randint(0, max(0, self.problem_count - 100))
+        return 'GET', f'/problems?after={after}&limit=100', None, {}
+
+    def questions(self, i):
+        return 'GET', f'/api/get-questions?level={self._randint(1, 5)}', None, {}
+
+    def user(self, i):
+        return 'GET', f'/users/{self._pick(self.users)[0]}', None, {}
+
+    def submit(self, i):
+        with self._lock:
+            photo = self.photos[self._next_photo % len(self.photos)]
+            self._next_photo += 1
+        return self._submit(i, photo)
+
+    def submit_warm(self, i):
+        return self._submit(i, self.photos[0])
+
+    def _submit(self, i, photo):
+        problem = self._randint(1, self.question_count)
+        body, content_type = multipart({'user_id': self._pick(self.users)[0]},
+                                       [('file', f'bench-{i}.jpg', photo)])
+        return 'POST', f'/problems/{problem}/submit', body, {'Content-Type': content_type}
+
+
+def drive(port, build_request, total, concurrency):
+    """Sends `total` requests from `concurrency` client threads; returns the summary."""
+    latencies = []
+    statuses = Counter()
+    errors = []
+    lock = threading.Lock()
+
+    def send(i):
+        method, path, body, headers = build_request(i)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            elapsed = round((time.perf_counter() - started) * 1000, 2)
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status] += 1
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(total)))
+    summary = summarize(latencies, statuses, len(errors), time.perf_counter() - started)
+    if errors:
+        summary['first_error'] = errors[0]
+    return summary
+
+
+def wait_for_grading(app, timeout):
+    """Waits until no submission is queued or running; returns status counts and drain time."""
+    from models.problem import Submission
+    from extensions import db
+
+    started = time.perf_counter()
+    with app.app_context():
+        while True:
+            counts = dict(db.session.query(Submission.status, db.func.count())
+                          .group_by(Submission.status).all())
+            db.session.rollback()  # Start a fresh snapshot for the next poll
+            pending = counts.get('queued', 0) + counts.get('running', 0)
+            if not pending or time.perf_counter() - started > timeout:
+                return {'submissions': counts, 'drain_seconds': round(time.perf_counter() - started, 2),
+                        'timed_out': bool(pending)}
+            time.sleep(0.2)
+
+
+def compare(results, baseline, tolerance):
+    """Prints current vs baseline per scenario; returns the list of regressions."""
+    regressions = []
+    print(f"\n{'scenario':<12} {'p95 ms':>10} {'base':>10} {'rps':>10} {'base':>10}")
+    for name, current in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        p95, base_p95 = current['latency_ms']['p95'], base['latency_ms']['p95']
+        rps, base_rps = current['throughput_rps'], base['throughput_rps']
+        print(f'{name:<12} {p95:>10} {base_p95:>10} {rps:>10} {base_rps:>10}')
+        if p95 and base_p95 and p95 > base_p95 * (1 + tolerance):
+            regressions.append(f'{name}: p95 {base_p95} ms -> {p95} ms')
+        if rps and base_rps and rps < base_rps * (1 - tolerance):
+            regressions.append(f'{name}: throughput {base_rps} -> {rps} req/s')
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    configure_environment(args, workdir)
+
+    from werkzeug.serving import make_server
+    from app import create_app
+    from bench.seed import seed_database, solution_photo, write_questions
+    from extensions import db
+
+    rng = random.Random(args.seed)
+    write_questions(os.environ['QUESTIONS_FILE'], args.questions, rng)
+
+    boot_started = time.perf_counter()
+    app = create_app()
+    boot_seconds = time.perf_counter() - boot_started
+
+    seed_started = time.perf_counter()
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        users = seed_database(args.users, args.problems, rng, app.config['PASSWORD_HASH_METHOD'])
+    seed_seconds = time.perf_counter() - seed_started
+    print(f"Seeded {args.users} users, {args.problems} problems and {args.questions} questions "
+          f"in {seed_seconds:.1f}s (workdir {workdir})")
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+
+    # Rendered up front so JPEG encoding in the client threads does not compete with the server
+    photo_count = args.warmup + args.requests if 'submit' in scenarios else 1
+    photos = [solution_photo(args.seed + i) for i in range(photo_count)]
+    builder = Scenarios(rng, users, args.problems, args.questions, photos)
+    results = {
+        'started_at': datetime.utcnow().isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'boot_seconds': round(boot_seconds, 3),
+        'seed_seconds': round(seed_seconds, 3),
+        'scenarios': {},
+    }
+    for name in scenarios:
+        if args.warmup:
+            drive(server.port, getattr(builder, name), args.warmup, args.concurrency)
+        summary = drive(server.port, getattr(builder, name), args.requests, args.concurrency)
+        results['scenarios'][name] = summary
+        latency = summary['latency_ms']
+        print(f"{name:<12} {summary['throughput_rps']} req/s  p50 {latency['p50']} ms  "
+              f"p95 {latency['p95']} ms  p99 {latency['p99']} ms  status {summary['status']}")
+        if name.startswith('submit'):
+            # Drain before the next scenario so cold and warm runs do not share a backlog
+            summary['grading'] = wait_for_grading(app, args.drain_timeout)
+            print(f"{'':<12} grading {summary['grading']}")
+
+    if 'submit' in scenarios or 'submit_warm' in scenarios:
+        from services.answer_check import answer_checker
+        results['answer_check'] = answer_checker.stats()
+        print(f"answer check short-circuited {results['answer_check']['short_circuited']} of "
+              f"{results['answer_check']['checked']} ({results['answer_check']['short_circuit_ratio']:.0%})")
+    server.shutdown()
+
+    output = args.output or os.path.join(os.path.dirname(__file__), 'results',
+                                         f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('\nRegressions:\n  ' + '\n  '.join(regressions))
+            return 1
+        print('\nNo regressions beyond tolerance')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
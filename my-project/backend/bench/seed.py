@@ -0,0 +1,69 @@
+"""Synthetic users, problems and questions for the load test."""
+import io
+import json
+import random
+
+from PIL import Image, ImageDraw
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models.problem import Problem
+from models.user import User
+
+TOPICS = ('algebra', 'calculus', 'geometry', 'probability', 'trigonometry')
+PASSWORD = 'bench-password'
+
+
+def write_questions(path, count, rng):
+    """Writes a questions.json in the question bank's format; IDs run question-1..count."""
+    questions = []
+    for i in range(1, count + 1):
+        a, b = rng.randint(1, 9), rng.randint(1, 9)
+        questions.append({
+            'Question ID': f'question-{i}',
+            'Level': f'Level {rng.randint(1, 5)}',
+            'Topic': rng.choice(TOPICS),
+            'Question': f'Solve x^2 + {a + b}x + {a * b} = 0',
+            'Solution': f'x = -{a}, -{b}',
+        })
+    with open(path, 'w') as f:
+        json.dump(questions, f)
+
+
+def seed_database(users, problems, rng, password_method):
+    """Bulk-inserts users and problems; returns (userid, username) of the new users.
+
+    Every user shares one password hash, so seeding thousands of users
+    costs a single KDF run while logins still verify at full cost.
+    """
+    hashed = generate_password_hash(PASSWORD, method=password_method)
+    first_user = (db.session.query(db.func.max(User.userid)).scalar() or 0) + 1
+
+    db.session.execute(insert(User), [
+        {'username': f'bench-user-{first_user + i}', 'password': hashed,
+         'rating_score': round(max(0.0, rng.gauss(300, 150)), 2)}
+        for i in range(users)
+    ])
+    db.session.execute(insert(Problem), [
+        {'title': f'Bench problem {i}', 'content': 'Solve for x. ' * rng.randint(5, 60),
+         'difficulty': rng.randint(1, 5), 'topic': rng.choice(TOPICS)}
+        for i in range(problems)
+    ])
+    db.session.commit()
+    return db.session.query(User.userid, User.username).filter(User.userid >= first_user).all()
+
+
+def solution_photo(seed=0, size=(1600, 1200)):
+    """A JPEG that looks enough like a photographed worksheet to exercise preprocessing."""
+    rng = random.Random(seed)
+    image = Image.new('RGB', size, (236, 232, 220))
+    draw = ImageDraw.Draw(image)
+    for line in range(12):
+        y = 80 + line * 90
+        draw.text((100 + rng.randint(-10, 10), y), f'x^2 + {rng.randint(2, 18)}x + {rng.randint(1, 81)} = 0',
+                  fill=(30, 30, 60))
+        draw.line((90, y + 40, size[0] - 90, y + 40 + rng.randint(-6, 6)), fill=(180, 190, 210), width=2)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
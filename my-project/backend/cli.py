@@ -0,0 +1,68 @@
+import click
+
+from extensions import db
+from services.database import database
+from services.leaderboard import leaderboard
+from services.rating import rating_engine
+from services.stats import submission_stats
+from services.storage import image_store
+from services.submissions import backfill, ensure_schema
+
+
+def register_commands(app):
+    """Adds the backend's maintenance commands to the `flask` CLI."""
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Create any missing database tables, and add missing submission columns to an existing table."""
+        db.create_all()
+        added = ensure_schema()
+        if added:
+            click.echo(f"Added submission columns: {', '.join(added)}")
+        click.echo("Database tables created")
+
+    @app.cli.command('backfill-submissions')
+    @click.option('--batch-size', default=1000, show_default=True, help='Submissions updated per transaction.')
+    @click.option('--force', is_flag=True, help='Recompute rows that already have a verdict.')
+    def backfill_submissions(batch_size, force):
+        """Add the typed submission columns and indexes if missing, then fill them from model_output."""
+        database.lift_statement_timeout()
+        added = ensure_schema()
+        if added:
+            click.echo(f"Added columns: {', '.join(added)}")
+        stats = backfill(batch_size=batch_size, force=force,
+                         progress=lambda stats, last_id: click.echo(f"  {stats['scanned']} rows (up to id {last_id})"))
+        click.echo(f"Backfilled {stats['updated']} of {stats['scanned']} submissions; "
+                   f"{stats['unparsed']} had no parseable verdict")
+
+    @app.cli.command('replay-ratings')
+    @click.option('--batch-size', default=1000, show_default=True, help='Submissions read per query.')
+    def replay_ratings(batch_size):
+        """Rebuild every user's rating and rating history from graded submissions."""
+        database.lift_statement_timeout()
+        ensure_schema()
+        result = rating_engine.replay(batch_size=batch_size)
+        leaderboard.invalidate()
+        click.echo(f"Replayed {result['submissions']} submissions for {result['users']} users")
+
+    @app.cli.command('rebuild-stats')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows read and inserted per round trip.')
+    def rebuild_stats(batch_size):
+        """Recompute the per-problem and per-user stats tables from graded submissions."""
+        database.lift_statement_timeout()
+        ensure_schema()
+        result = submission_stats.rebuild(batch_size=batch_size)
+        click.echo(f"Rebuilt stats for {result['problems']} problems ({result['user_rows']} user topic/difficulty rows)")
+
+    @app.cli.command('compact-images')
+    @click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it.')
+    @click.option('--grace-hours', type=float, default=None,
+                  help='Keep unreferenced images newer than this (default STORAGE_ORPHAN_GRACE_SECONDS).')
+    def compact_images(dry_run, grace_hours):
+        """Delete stored images, thumbnails and OCR copies no submission or profile references."""
+        database.lift_statement_timeout()
+        grace = None if grace_hours is None else grace_hours * 3600
+        stats = image_store.compact(dry_run=dry_run, grace_seconds=grace)
+        verb = 'Would delete' if dry_run else 'Deleted'
+        click.echo(f"Scanned {stats['scanned']} objects. {verb} {stats['deleted']} "
+                   f"({stats['bytes_freed']} bytes); kept {stats['kept_recent']} recent unreferenced objects")
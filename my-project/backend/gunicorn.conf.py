@@ -0,0 +1,8 @@
+"""Loaded automatically by gunicorn when started from this directory."""
+
+
+def post_worker_init(worker):
+    # With --preload the app (and the grading queue) was built in the master;
+    # start this worker's grading threads and heartbeat as soon as it is forked
+    from services.grading_queue import grading_queue
+    grading_queue.start()
@@ -10,6 +10,12 @@ class Problem(db.Model):
     difficulty = db.Column(db.Integer, nullable=False)  # 1-5
     topic = db.Column(db.String(50), nullable=False)    # algebra, calculus, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Back the topic/difficulty filters on GET /problems, in keyset (problem_id) order
+    __table_args__ = (
+        db.Index('ix_problems_topic_difficulty', 'topic', 'difficulty', 'problem_id'),
+        db.Index('ix_problems_difficulty', 'difficulty', 'problem_id'),
+    )
     
     def __repr__(self):
         return f'<Problem {self.title}, ID: {self.problem_id}>'
@@ -35,8 +41,41 @@ class Submission(db.Model):
     problem_id = db.Column(db.String(50), nullable=False)  # Change to String instead of Foreign Key
     user_id = db.Column(db.Integer, nullable=True)
     image_path = db.Column(db.String(255), nullable=True)
+    image_paths = db.Column(db.Text, nullable=True)  # JSON list of every page's storage key, in page order
     model_output = db.Column(db.Text, nullable=True)  # Add this line to store the model output
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed, cancelled
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    worker_id = db.Column(db.String(100), nullable=True)  # process whose in-memory queue holds it
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Grading results pulled out of model_output so history queries need no JSON parsing
+    verdict = db.Column(db.String(20), nullable=True)  # CORRECT, PARTIALLY CORRECT, INCORRECT or NOT CHECKED (the approach)
+    answer_matches = db.Column(db.Boolean, nullable=True)
+    is_correct = db.Column(db.Boolean, nullable=True)  # correct approach and matching answer
+    score = db.Column(db.Float, nullable=True)  # 0..1 credit, as used for ratings
+    ocr_text = db.Column(db.Text, nullable=True)
+    latency_ms = db.Column(db.Integer, nullable=True)  # sum of grading stage timings
+
+    # Per-user and per-problem history in keyset (submission_id) order, and accuracy per problem
+    __table_args__ = (
+        db.Index('ix_submissions_user', 'user_id', 'submission_id'),
+        db.Index('ix_submissions_problem', 'problem_id', 'submission_id'),
+        db.Index('ix_submissions_problem_correct', 'problem_id', 'is_correct'),
+        db.Index('ix_submissions_submitted_at', 'submitted_at'),
+    )
     
     def __repr__(self):
-        return f'<Submission {self.submission_id} for Problem {self.problem_id}>'
\ No newline at end of file
+        return f'<Submission {self.submission_id} for Problem {self.problem_id}>'
+
+
+class GradingWorker(db.Model):
+    __tablename__ = 'grading_workers'
+
+    # One row per live grading process; rows owned by a worker that stopped
+    # heartbeating are failed by the others
+    worker_id = db.Column(db.String(100), primary_key=True)  # host:pid:token
+    heartbeat_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GradingWorker {self.worker_id} at {self.heartbeat_at}>'
@@ -8,6 +8,44 @@ class RatingHistory(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.userid'), nullable=False)
     rating = db.Column(db.Float, nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Chart range reads are (user_id, date) scans; including rating makes them index-only
+    __table_args__ = (
+        db.Index('ix_rating_history_user_date', 'user_id', 'date', 'rating'),
+    )
     
     def __repr__(self):
-        return f'<RatingHistory {self.id} User: {self.user_id}, Rating: {self.rating}>'
\ No newline at end of file
+        return f'<RatingHistory {self.id} User: {self.user_id}, Rating: {self.rating}>'
+
+class RatingSummary(db.Model):
+    __tablename__ = 'rating_summaries'
+
+    # One row per user, maintained alongside RatingHistory by the rating engine
+    user_id = db.Column(db.Integer, db.ForeignKey('users.userid'), primary_key=True)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    first_date = db.Column(db.DateTime, nullable=True)
+    last_date = db.Column(db.DateTime, nullable=True)
+    min_rating = db.Column(db.Float, nullable=True)
+    max_rating = db.Column(db.Float, nullable=True)
+    last_rating = db.Column(db.Float, nullable=True)
+
+    def add_point(self, date, rating):
+        self.points = (self.points or 0) + 1
+        self.first_date = min(self.first_date, date) if self.first_date else date
+        self.last_date = max(self.last_date, date) if self.last_date else date
+        self.min_rating = min(self.min_rating, rating) if self.min_rating is not None else rating
+        self.max_rating = max(self.max_rating, rating) if self.max_rating is not None else rating
+        self.last_rating = rating
+
+    def to_dict(self):
+        return {
+            'points': self.points,
+            'first_date': self.first_date.isoformat() if self.first_date else None,
+            'last_date': self.last_date.isoformat() if self.last_date else None,
+            'min_rating': self.min_rating,
+            'max_rating': self.max_rating,
+            'last_rating': self.last_rating
+        }
+
+    def __repr__(self):
+        return f'<RatingSummary User: {self.user_id}, Points: {self.points}>'
@@ -0,0 +1,52 @@
+from extensions import db
+
+
+class StatsCounters:
+    """Counter columns shared by the per-problem and per-user summaries.
+
+    Rows only ever change by adding to these counters, in the same
+    transaction as the graded submission; `flask rebuild-stats` recomputes
+    them from submissions if they drift.
+    """
+
+    attempts = db.Column(db.Integer, nullable=False, default=0)   # graded submissions
+    correct = db.Column(db.Integer, nullable=False, default=0)    # correct approach and matching answer
+    partial = db.Column(db.Integer, nullable=False, default=0)    # some credit, not full
+    incorrect = db.Column(db.Integer, nullable=False, default=0)  # no credit
+    score_total = db.Column(db.Float, nullable=False, default=0.0)
+    latency_total_ms = db.Column(db.BigInteger, nullable=False, default=0)
+    latency_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        attempts = self.attempts or 0
+        return {
+            'attempts': attempts,
+            'correct': self.correct,
+            'partial': self.partial,
+            'incorrect': self.incorrect,
+            'solve_rate': round(self.correct / attempts, 4) if attempts else None,
+            'average_score': round(self.score_total / attempts, 4) if attempts else None,
+            'average_latency_ms': round(self.latency_total_ms / self.latency_count, 1) if self.latency_count else None,
+        }
+
+
+class ProblemStats(StatsCounters, db.Model):
+    __tablename__ = 'problem_stats'
+
+    # Same 'question-12' IDs as Submission.problem_id
+    problem_id = db.Column(db.String(50), primary_key=True)
+
+    def __repr__(self):
+        return f'<ProblemStats {self.problem_id}: {self.correct}/{self.attempts}>'
+
+
+class UserStats(StatsCounters, db.Model):
+    __tablename__ = 'user_stats'
+
+    # One row per user and topic, and per user and difficulty; a user's stats are one primary-key range read
+    user_id = db.Column(db.Integer, db.ForeignKey('users.userid'), primary_key=True)
+    dimension = db.Column(db.String(20), primary_key=True)  # 'topic' or 'difficulty'
+    value = db.Column(db.String(50), primary_key=True)      # e.g. 'algebra' or '3'
+
+    def __repr__(self):
+        return f'<UserStats {self.user_id} {self.dimension}={self.value}: {self.correct}/{self.attempts}>'
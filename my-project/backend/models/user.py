@@ -6,7 +6,7 @@ class User(db.Model):
     userid = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), nullable=False)
     password = db.Column(db.String(256), nullable=False)
-    rating_score = db.Column(db.Float, nullable=False)
+    rating_score = db.Column(db.Float, nullable=False, index=True)  # indexed for the leaderboard
     profile_image = db.Column(db.String(255), nullable=True)
     
     # Define relationship with rating history
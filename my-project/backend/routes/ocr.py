@@ -1,32 +1,104 @@
 from langgraph.graph import StateGraph, START, END
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langgraph.types import Send
 from dotenv import load_dotenv
-from typing import TypedDict
+from typing import Annotated, TypedDict
+import asyncio
+import operator
 import re
+import threading
 from langchain_core.messages import HumanMessage, SystemMessage
-import base64
+from langchain_core.runnables import RunnableLambda
+from services.answer_check import answer_checker
+from services.images import image_pipeline
+from services.metrics import metrics
+from services.model_backends import model_registry
+from services.ocr_cache import ocr_cache
+from services.preprocess import preprocessor
+from services.verdict_cache import OCR_PREFIX, verdict_cache
 
 load_dotenv()
 
-class State(TypedDict):
+def merge_timings(left, right):
+    # Pages are transcribed in parallel, so the slowest page is the stage's wall time
+    merged = dict(left or {})
+    for stage, ms in (right or {}).items():
+        merged[stage] = max(ms, merged.get(stage, 0))
+    return merged
+
+def merge_usage(left, right):
+    # One OCR call per page: add them up per role
+    merged = {role: dict(usage) for role, usage in (left or {}).items()}
+    for role, usage in (right or {}).items():
+        totals = merged.setdefault(role, {})
+        for key, value in usage.items():
+            totals[key] = totals.get(key, 0) + value
+    return merged
+
+class PageState(TypedDict):
+    """One image of a submission, transcribed by the page subgraph."""
+    page: int  # 0-based position in the submission
     img_path: str
+    ocr_img_path: str
+    img_hash: str
     ocr_output: str
+    ocr_cached: bool
+    image_stats: dict
+    preprocess_stats: dict
+    timings: Annotated[dict, operator.or_]
+    llm_usage: Annotated[dict, operator.or_]
+
+class State(TypedDict):
+    pages: list  # [{'img_path', 'img_hash'}] in page order
+    page_outputs: Annotated[list, operator.add]  # one entry per transcribed page, in completion order
+    problem_id: str
+    ocr_output: str  # every page's transcription, merged in page order
     system_ans: str
     final_output: str
+    answer_check: dict
+    detailed_feedback: bool  # always ask the compare model, even for a checked match
+    timings: Annotated[dict, merge_timings]  # stage -> ms, merged across nodes and pages
+    llm_usage: Annotated[dict, merge_usage]  # role -> tokens and bytes of its model calls
+
+def ocr_cache_node(state: PageState):
+    cached = ocr_cache.get(state.get('img_hash'))
+    if cached is not None:
+        return {'ocr_output': cached, 'ocr_cached': True}
+    return {}
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro-exp-03-25")
+def route_after_cache(state: PageState):
+    # Identical image bytes were transcribed before: this page is done
+    return END if state.get('ocr_output') is not None else "preprocess"
 
-def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+def preprocess_node(state: PageState):
+    if not preprocessor.enabled:
+        return {}
 
-def ocr_node(state: State):
-    img_path = state['img_path']
+    try:
+        ocr_img_path, future = preprocessor.submit(state['img_path'])
+        stats = future.result()
+    except Exception as e:
+        # A photo we cannot clean up is still worth sending as-is
+        print(f"Error preprocessing {state['img_path']}: {str(e)}")
+        return {}
 
-    encoded_image = encode_image(img_path)
+    print(f"Preprocessed {state['img_path']}: {stats}")
+    return {'ocr_img_path': ocr_img_path, 'preprocess_stats': stats}
 
-    messages = [
-        SystemMessage('''
+async def apreprocess_node(state: PageState):
+    if not preprocessor.enabled:
+        return {}
+
+    try:
+        ocr_img_path, future = preprocessor.submit(state['img_path'])
+        stats = await asyncio.wrap_future(future)
+    except Exception as e:
+        print(f"Error preprocessing {state['img_path']}: {str(e)}")
+        return {}
+
+    print(f"Preprocessed {state['img_path']}: {stats}")
+    return {'ocr_img_path': ocr_img_path, 'preprocess_stats': stats}
+
+OCR_PROMPT = '''
                 INSTRUCTION: PARSE TEXT ONLY - DO NOT SOLVE
                 Your task is to accurately transcribe the handwritten text in the image without analyzing, solving, or providing any steps toward a solution.
                 Rules:
@@ -39,26 +111,48 @@ def ocr_node(state: State):
                 7. Do NOT provide explanations, suggestions, or commentary
                 After transcription, begin your response with "Thus the parsed text is:" followed by the verbatim transcription.
                 IMPORTANT: No matter how simple the problem might appear, you are ONLY permitted to transcribe the text, not solve it.
-        '''),
+        '''
+
+def ocr_messages(image_url):
+    return [
+        SystemMessage(OCR_PROMPT),
         HumanMessage(
             content=[
-                {"type": "image_url", "image_url": f"data:image/jpeg;base64,{encoded_image}"}
+                {"type": "image_url", "image_url": image_url}
             ]
         )
     ]
 
+def ocr_payload(state: PageState):
+    img_path = state.get('ocr_img_path')
+    if img_path:
+        # The preprocessor already wrote a grayscale JPEG at the OCR size and quality
+        image_url, image_stats = image_pipeline.file_url(img_path)
+    else:
+        # Downsampled JPEG as a data URL, built from a single buffer
+        img_path = state['img_path']
+        image_url, image_stats = image_pipeline.data_url(img_path)
+    print(f"OCR payload for {img_path}: {image_stats}")
+    return image_url, image_stats
 
-    result = llm.invoke(messages)
+def ocr_result(state: PageState, result, image_stats):
+    usage = metrics.llm_call('ocr', image_stats['payload_bytes'] + len(OCR_PROMPT.encode('utf-8')), result)
+    content = re.sub(r'\\\\', r'\\', result.content)
+    ocr_cache.put(state.get('img_hash'), content)
+    return {'ocr_output': content, 'image_stats': image_stats, 'llm_usage': {'ocr': usage}}
 
-    result = re.sub(r'\\\\', r'\\', result.content)
-    return {'ocr_output': result}
+def ocr_node(state: PageState):
+    image_url, image_stats = ocr_payload(state)
+    result = model_registry.get('ocr').invoke(ocr_messages(image_url))
+    return ocr_result(state, result, image_stats)
 
-def compare_node(state: State):
-    human_ans = state['ocr_output']
-    system_ans = state['system_ans']
+async def aocr_node(state: PageState):
+    # Decoding and resizing are CPU work; keep them off the event loop
+    image_url, image_stats = await asyncio.to_thread(ocr_payload, state)
+    result = await model_registry.get('ocr').ainvoke(ocr_messages(image_url))
+    return ocr_result(state, result, image_stats)
 
-    result = llm.invoke([
-        HumanMessage(f'''As an answer evaluator, your task is to compare a human's solution approach and final answer with the system's answer.
+COMPARE_PROMPT = '''As an answer evaluator, your task is to compare a human's solution approach and final answer with the system's answer.
         Human Answer:
         {human_ans}
 
@@ -78,18 +172,141 @@ def compare_node(state: State):
 
         Conclude with a clear verdict: "The human's solution approach is [CORRECT/PARTIALLY CORRECT/INCORRECT] and the final answer is [MATCHES/DOES NOT MATCH] the system's answer.
         Respond like a human.
-        "''')
-    ])
+        "'''
+
+def compare_request(state: State):
+    """Returns (cache key, cached verdict or None, prompt) for a compare step."""
+    human_ans = state['ocr_output']
+    system_ans = state['system_ans']
+
+    # Repeated answers to the same problem reuse the earlier verdict
+    cache_key = verdict_cache.make_key(human_ans, state.get('problem_id'), system_ans, COMPARE_PROMPT)
+    prompt = COMPARE_PROMPT.format(human_ans=human_ans, system_ans=system_ans)
+    return cache_key, verdict_cache.get(cache_key), prompt
+
+def compare_result(cache_key, prompt, result):
+    usage = metrics.llm_call('compare', len(prompt.encode('utf-8')), result)
+    verdict_cache.put(cache_key, result.content)
+    return {'final_output': result.content, 'llm_usage': {'compare': usage}}
+
+def compare_node(state: State):
+    cache_key, cached, prompt = compare_request(state)
+    if cached is not None:
+        return {'final_output': cached}
+
+    result = model_registry.get('compare').invoke([HumanMessage(prompt)])
+    return compare_result(cache_key, prompt, result)
+
+async def acompare_node(state: State):
+    cache_key, cached, prompt = compare_request(state)
+    if cached is not None:
+        return {'final_output': cached}
+
+    result = await model_registry.get('compare').ainvoke([HumanMessage(prompt)])
+    return compare_result(cache_key, prompt, result)
+
+def answer_check_node(state: State):
+    if not answer_checker.enabled:
+        return {}
+
+    result = answer_checker.check(state.get('problem_id'), state['ocr_output'], state['system_ans'])
+    short_circuit = result['outcome'] == 'match' and not state.get('detailed_feedback')
+    answer_checker.record(result['outcome'], short_circuit)
+    if short_circuit:
+        return {'answer_check': result, 'final_output': answer_checker.verdict(result)}
+    return {'answer_check': result}
+
+async def aanswer_check_node(state: State):
+    # SymPy simplification is CPU work; keep it off the event loop
+    return await asyncio.to_thread(answer_check_node, state)
+
+def route_after_check(state: State):
+    # A confident local match is the verdict; everything else needs the model
+    return END if state.get('final_output') is not None else "compare"
+
+def fan_out_pages(state: State):
+    # One page subgraph run per image; they execute concurrently in the same step
+    return [Send("page", {'page': i, 'img_path': page['img_path'], 'img_hash': page['img_hash']})
+            for i, page in enumerate(state['pages'])]
+
+def page_update(result):
+    """What a finished page contributes to the submission's state."""
+    return {
+        'page_outputs': [{
+            'page': result['page'],
+            'ocr_output': result['ocr_output'],
+            'cached': bool(result.get('ocr_cached')),
+            'image_stats': result.get('image_stats'),
+            'preprocess_stats': result.get('preprocess_stats'),
+        }],
+        'timings': result.get('timings', {}),
+        'llm_usage': result.get('llm_usage', {}),
+    }
+
+def merge_pages_node(state: State):
+    pages = sorted(state['page_outputs'], key=lambda page: page['page'])
+    if len(pages) == 1:
+        # Unchanged for single images, so cached verdicts still apply
+        return {'ocr_output': pages[0]['ocr_output']}
+    return {'ocr_output': '\n\n'.join(f"Page {page['page'] + 1}:\n{OCR_PREFIX.sub('', page['ocr_output']).strip()}"
+                                       for page in pages)}
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def timed_runnable(name, node, anode):
+    """Node with an async twin (used by graph.ainvoke), both reporting into timings."""
+    timed = metrics.timed_node(name)
+    return RunnableLambda(timed(node), afunc=timed(anode))
+
+
+def build_page_graph():
+    builder = StateGraph(PageState)
+
+    # Every node reports its duration into state['timings'] and the stage histogram
+    builder.add_node("ocr_cache", metrics.timed_node("ocr_cache")(ocr_cache_node))
+    builder.add_node("preprocess", timed_runnable("preprocess", preprocess_node, apreprocess_node))
+    builder.add_node("ocr", timed_runnable("ocr", ocr_node, aocr_node))
+
+    builder.add_edge(START, "ocr_cache")
+    builder.add_conditional_edges("ocr_cache", route_after_cache, ["preprocess", END])
+    builder.add_edge("preprocess", "ocr")
+    builder.add_edge("ocr", END)
+
+    return builder.compile()
+
+
+def build_graph():
+    page_graph = build_page_graph()
+
+    def page_node(state: PageState):
+        return page_update(page_graph.invoke(state))
+
+    async def apage_node(state: PageState):
+        return page_update(await page_graph.ainvoke(state))
 
-    return {'final_output': result.content}
+    builder = StateGraph(State)
+    builder.add_node("page", RunnableLambda(page_node, afunc=apage_node))
+    builder.add_node("merge_pages", merge_pages_node)
+    # Nodes that wait on the model or do heavy CPU work get an async twin
+    builder.add_node("answer_check", timed_runnable("answer_check", answer_check_node, aanswer_check_node))
+    builder.add_node("compare", timed_runnable("compare", compare_node, acompare_node))
 
-builder = StateGraph(State)
+    builder.add_conditional_edges(START, fan_out_pages, ["page"])
+    builder.add_edge("page", "merge_pages")
+    builder.add_edge("merge_pages", "answer_check")
+    builder.add_conditional_edges("answer_check", route_after_check, ["compare", END])
+    builder.add_edge("compare", END)
 
-builder.add_node("ocr", ocr_node)
-builder.add_node("compare", compare_node)
+    return builder.compile()
 
-builder.add_edge(START, "ocr")
-builder.add_edge("ocr", "compare")
-builder.add_edge("compare", END)
 
-graph = builder.compile()
\ No newline at end of file
+def get_graph():
+    """Compiles the grading graph on first use and reuses it afterwards."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
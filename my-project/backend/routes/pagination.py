@@ -0,0 +1,52 @@
+from flask import request, jsonify, current_app
+
+
+def page_args():
+    """Reads ?after=&limit= for keyset pagination; limit is clamped to the configured max."""
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', current_app.config['PAGE_DEFAULT_LIMIT'], type=int)
+    return after, max(1, min(limit, current_app.config['PAGE_MAX_LIMIT']))
+
+
+def field_args(allowed, required):
+    """Parses ?fields=a,b into a column list; 'required' (the sort key) is always included.
+
+    Raises ValueError for unknown field names.
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return list(allowed)
+
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return [required] + [f for f in requested if f != required]
+
+
+def keyset_page(query, key_column, after, limit, descending=False):
+    """Returns (rows, next cursor) for rows ordered by key_column after the cursor.
+
+    With descending=True the newest rows come first and the cursor moves down.
+    """
+    if after is not None:
+        query = query.filter(key_column < after if descending else key_column > after)
+    rows = query.order_by(key_column.desc() if descending else key_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, getattr(rows[-1], key_column.key)
+    return rows, None
+
+
+def conditional_json(data, next_cursor=None):
+    """jsonify with an ETag; answers 304 when the client's If-None-Match still matches.
+
+    The body stays a plain list for existing clients; the next page cursor
+    travels in the X-Next-Cursor header.
+    """
+    response = jsonify(data)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    response.headers['Access-Control-Expose-Headers'] = 'ETag, X-Next-Cursor'
+    response.add_etag()
+    return response.make_conditional(request)
@@ -1,47 +1,96 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, send_file
 import os
-from werkzeug.utils import secure_filename
 from models.problem import Problem, Submission
 from models.user import User
 from extensions import db
+from services.question_bank import question_bank
+from routes.pagination import page_args, field_args, keyset_page, conditional_json
+from services.grading_queue import grading_queue, QueueFullError, GradingError
+from services.images import image_pipeline, UploadTooLarge
+from services.storage import image_store
+from services.ocr_cache import ocr_cache
+from services.verdict_cache import verdict_cache
+from services.answer_check import answer_checker
+from services.rating import rating_engine
+from services.database import database
+from services.metrics import metrics
+from services.submissions import SUBMISSION_FIELDS, apply_result, row_json
+from services.stats import submission_stats
+from services.recommender import question_recommender
 import subprocess
 import json
-import random
-
-# Import your state graph and compiled graph from your model file.
-# For example, if your model code is in a file called model_pipeline.py:
-from .ocr import graph  # graph is the compiled StateGraph from your model code
+import zipfile
+from concurrent.futures import as_completed
 
 problem_routes = Blueprint('problem_routes', __name__)
 
 
-
-# Create a directory for uploads if it doesn't exist
-UPLOAD_FOLDER = 'uploads/solutions'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-
-# Debugging: Print the upload folder path
-print(f"Upload folder set to: {os.path.abspath(UPLOAD_FOLDER)}")
+PROBLEM_FIELDS = ('problem_id', 'title', 'content', 'difficulty', 'topic')
 
 @problem_routes.route('/problems', methods=['GET'])
 def get_problems():
     try:
-        problems = Problem.query.all()
-        result = [{
-            'problem_id': problem.problem_id,
-            'title': problem.title,
-            'content': problem.content,
-            'difficulty': problem.difficulty,
-            'topic': problem.topic
-        } for problem in problems]
+        after, limit = page_args()
+        fields = field_args(PROBLEM_FIELDS, 'problem_id')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Select only the requested columns so large 'content' text can be skipped
+        query = database.read_session().query(*[getattr(Problem, f) for f in fields])
+        topic = request.args.get('topic')
+        difficulty = request.args.get('difficulty', type=int)
+        if topic:
+            query = query.filter(Problem.topic == topic)
+        if difficulty is not None:
+            query = query.filter(Problem.difficulty == difficulty)
+
+        rows, next_cursor = keyset_page(query, Problem.problem_id, after, limit)
+        result = [row._asdict() for row in rows]
         
         print(f"Found {len(result)} problems")
-        return jsonify(result), 200
+        return conditional_json(result, next_cursor)
     except Exception as e:
         print(f"Error in get_problems: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@problem_routes.route('/problems/<int:problem_id>/submissions', methods=['GET'])
+def get_problem_submissions(problem_id):
+    """A problem's submissions, newest first; ?correct=true|false and ?status= filter."""
+    try:
+        after, limit = page_args()
+        fields = field_args(SUBMISSION_FIELDS, 'submission_id')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Range read on the (problem_id, submission_id) index, or (problem_id, is_correct)
+        query = (database.read_session().query(*[getattr(Submission, f) for f in fields])
+                 .filter(Submission.problem_id == normalize_question_id(problem_id)))
+        correct = request.args.get('correct')
+        if correct is not None:
+            query = query.filter(Submission.is_correct == (correct.lower() in ('1', 'true')))
+        if request.args.get('status'):
+            query = query.filter(Submission.status == request.args['status'])
+
+        rows, next_cursor = keyset_page(query, Submission.submission_id, after, limit, descending=True)
+        return conditional_json([row_json(row) for row in rows], next_cursor)
+    except Exception as e:
+        print(f"Error fetching submissions for problem {problem_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@problem_routes.route('/problems/<int:problem_id>/stats', methods=['GET'])
+def get_problem_stats(problem_id):
+    """Attempts, solve rate and average grading time, from the maintained summary row."""
+    try:
+        stats = submission_stats.problem(normalize_question_id(problem_id))
+        if stats is None:
+            return jsonify({'problem_id': problem_id, 'attempts': 0}), 200
+        return jsonify({'problem_id': problem_id, **stats.to_dict()}), 200
+    except Exception as e:
+        print(f"Error fetching stats for problem {problem_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @problem_routes.route('/problems/<int:problem_id>', methods=['GET'])
 def get_problem(problem_id):
     try:
@@ -59,23 +108,58 @@ def get_problem(problem_id):
 
 
 def get_system_answer(problem_id):
-    """Fetches the system answer from a JSON file using problem_id."""
+    """Fetches the system answer from the in-memory question bank using problem_id."""
     try:
-        with open("C:/Users/Lakshay/OneDrive/Desktop/Math Tutor/my-project/questions.json", 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        # print("problem id: ",problem_id)
-        for problem in data:
-            # print("test: ",str(problem.get('Question ID')), str(problem_id))
-            if str(problem.get('Question ID')) == str(problem_id):  # Ensure proper type comparison
-                return problem.get('Solution')
-
-        return None  # Return None if no matching problem_id is found
+        return question_bank.get_solution(problem_id)  # None if no matching problem_id is found
     except Exception as e:
-        print(f"Error reading JSON file: {str(e)}")
+        print(f"Error reading question bank: {str(e)}")
         return None
 
+def wants_event_stream():
+    return (request.args.get('stream', '').lower() in ('1', 'true')
+            or 'text/event-stream' in request.headers.get('Accept', ''))
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_submission(problem_id, user_id, image_keys, state):
+    """Body of a streamed submission: persists it, then relays grading events as SSE.
+
+    The row is created here rather than in the view so that a client gone
+    before the stream starts leaves no submission stuck in 'queued'.
+    """
+    submission = Submission(problem_id=problem_id, user_id=user_id, image_path=image_keys[0],
+                            image_paths=json.dumps(image_keys), status='queued',
+                            worker_id=grading_queue.worker_id)
+    with metrics.span('db_insert', state['timings']):
+        db.session.add(submission)
+        db.session.commit()
+    submission_id = submission.submission_id
+    question_recommender.mark_attempted(user_id, problem_id)
+
+    completed = False
+    try:
+        yield sse('submitted', {'submission_id': submission_id, 'status_url': f'/submissions/{submission_id}'})
+        for event, data in grading_queue.stream(submission_id, state):
+            yield sse(event, data)
+        completed = True
+    finally:
+        if not completed:
+            grading_queue.abandon(submission_id)
+
 @problem_routes.route('/problems/<int:problem_id>/submit', methods=['POST'])
 def submit_solution(problem_id):
+    """Saves a solution's photos and grades them.
+
+    Send one 'file' part per page (up to SUBMISSION_MAX_PAGES); the pages
+    are transcribed in parallel and graded together in upload order. By default the submission is queued and 202 returned for polling. With
+    ?stream=1 (or Accept: text/event-stream) it is graded within this
+    request and the response is an SSE stream: 'submitted', 'ocr_page' per
+    transcribed page, 'ocr' with the merged transcription, 'token' events with the verdict as it is generated, then
+    'done' or 'error'. A final answer the local checker can confirm is
+    graded without the compare model unless the form sets feedback=1.
+    """
+    streaming = wants_event_stream()
     print("Received file upload request")
     print("Files in request:", list(request.files.keys()))
     print("Form data:", list(request.form.keys()))
@@ -83,71 +167,351 @@ def submit_solution(problem_id):
     if 'file' not in request.files:
         return jsonify({'error': 'No file part in the request'}), 400
 
-    file = request.files['file']
+    files = request.files.getlist('file')
     user_id = request.form.get('user_id')
     
     if not user_id:
         return jsonify({'error': 'User ID is required'}), 400
     
-    if file.filename == '':
+    if any(file.filename == '' for file in files):
         return jsonify({'error': 'No selected file'}), 400
+
+    if len(files) > current_app.config['SUBMISSION_MAX_PAGES']:
+        return jsonify({'error': f"A submission is limited to {current_app.config['SUBMISSION_MAX_PAGES']} pages"}), 413
     
+    # Fail fast before touching the disk when the graders are saturated; a
+    # stream needs a stream slot or, failing that, room in the queue
+    saturated = not grading_queue.can_stream() if streaming else grading_queue.is_full()
+    if saturated:
+        return jsonify({'error': 'Grading queue is full, please retry shortly'}), 429, {'Retry-After': '5'}
+
+    timings = {}  # stage -> ms, carried through grading into the submission's log line
     try:
-        # Create user directory if it doesn't exist
-        user_folder = os.path.join(UPLOAD_FOLDER, str(user_id))
-        os.makedirs(user_folder, exist_ok=True)
-        
-        # Save file with secure filename
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(user_folder, filename)
-        absolute_path = os.path.abspath(file_path)
-        
-        print(f"Saving file to: {absolute_path}")
-        file.save(absolute_path)
-        
-        # Fetch system answer from JSON file
+        # Fetch system answer from the question bank
         changed_problem_id = "question-"+str(problem_id)  # Ensure problem_id is a string for JSON lookup
-        system_ans = get_system_answer(changed_problem_id)
+        with metrics.span('answer_lookup', timings):
+            system_ans = get_system_answer(changed_problem_id)
         
         if system_ans is None:
             return jsonify({'error': f'No system answer found for problem_id {problem_id}'}), 404
 
+        # Store each page under its content hash; resubmitting the same photo reuses it
+        with metrics.span('file_save', timings):
+            stored_pages = [image_store.save_upload(file) for file in files]
+        image_keys = [stored.key for stored in stored_pages]
+        for stored in stored_pages:
+            print(f"Stored {stored.size} bytes as {stored.key}" + (" (already stored)" if stored.deduplicated else ""))
+
         # Prepare the initial state for your model pipeline.
         state = {
-            "img_path": absolute_path,  # Image path for OCR node
+            "pages": [{
+                "img_path": image_store.local_path(stored.key),  # Image path for OCR node
+                "img_hash": stored.sha256,  # OCR cache key
+            } for stored in stored_pages],
+            "problem_id": changed_problem_id,  # Verdict cache key
             "system_ans": system_ans,   # Fetched from JSON
+            "timings": timings,
+            "detailed_feedback": request.form.get('feedback', '').lower() in ('1', 'true'),  # skip the local answer check
         }
-        
-        # Run the state graph to process the uploaded file.
-        try:
-            final_state = graph.invoke(state)
-        except Exception as e:
-            print(f"Error running model pipeline: {str(e)}")
-            return jsonify({'error': f'Model processing error: {str(e)}'}), 500
-        
-        # Save submission in database with the model output.
-        # In your submit_solution function, update line ~120-126:
 
-# Save submission in database with the model output.
+        if streaming:
+            return Response(stream_with_context(stream_submission(changed_problem_id, user_id, image_keys, state)),
+                            mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        # Persist the submission first so its ID doubles as the grading job ID
         submission = Submission(
             problem_id=changed_problem_id,  # Use the full question ID string instead of just problem_id
             user_id=user_id,
-            image_path=file_path,
-            model_output=json.dumps(final_state)  # Uncomment this line to store the model output
+            image_path=image_keys[0],  # first page, kept for single-image clients
+            image_paths=json.dumps(image_keys),
+            status='queued',
+            worker_id=grading_queue.worker_id  # this process's in-memory queue holds it
         )
-        db.session.add(submission)
-        db.session.commit()
+        with metrics.span('db_insert', timings):
+            db.session.add(submission)
+            db.session.commit()
+        question_recommender.mark_attempted(user_id, changed_problem_id)
+
+        try:
+            grading_queue.enqueue(submission.submission_id, state)
+        except QueueFullError as e:
+            print(f"Rejecting submission {submission.submission_id}: {str(e)}")
+            db.session.delete(submission)
+            db.session.commit()
+            return jsonify({'error': 'Grading queue is full, please retry shortly'}), 429, {'Retry-After': '5'}
         
         return jsonify({
-            'message': 'Solution submitted and processed successfully',
+            'message': 'Solution submitted and queued for grading',
             'submission_id': submission.submission_id,
-            'image_path': file_path,
-            'model_output': final_state
-        }), 201
+            'status': submission.status,
+            'status_url': f'/submissions/{submission.submission_id}',
+            'image_path': image_keys[0],
+            'image_url': f'/images/{image_keys[0]}',
+            'image_paths': image_keys,
+            'deduplicated': [stored.deduplicated for stored in stored_pages]
+        }), 202
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
         print(f"Error saving file: {str(e)}")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@problem_routes.route('/submissions/<int:submission_id>', methods=['GET'])
+def get_submission(submission_id):
+    try:
+        submission = Submission.query.get(submission_id)
+        
+        if not submission:
+            return jsonify({'error': f'Submission {submission_id} not found'}), 404
+        
+        return jsonify({
+            'submission_id': submission.submission_id,
+            'problem_id': submission.problem_id,
+            'user_id': submission.user_id,
+            'status': submission.status,
+            'attempts': submission.attempts,
+            'error': submission.error,
+            'image_path': submission.image_path,
+            'image_paths': json.loads(submission.image_paths) if submission.image_paths else [submission.image_path],
+            'submitted_at': submission.submitted_at.isoformat() if submission.submitted_at else None,
+            'model_output': json.loads(submission.model_output) if submission.model_output else None
+        }), 200
+    except Exception as e:
+        print(f"Error fetching submission {submission_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
     
+@problem_routes.route('/submissions/<int:submission_id>', methods=['DELETE'])
+def cancel_submission(submission_id):
+    try:
+        submission = Submission.query.get(submission_id)
+        
+        if not submission:
+            return jsonify({'error': f'Submission {submission_id} not found'}), 404
+        if submission.status not in ('queued', 'running'):
+            return jsonify({'error': f'Submission {submission_id} is already {submission.status}'}), 409
+        
+        grading_queue.cancel(submission_id)
+        submission.status = 'cancelled'
+        db.session.commit()
+        return jsonify({'message': 'Submission cancelled', 'submission_id': submission_id}), 200
+    except Exception as e:
+        print(f"Error cancelling submission {submission_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def normalize_question_id(problem_id):
+    """Accepts '12' or 'question-12' and returns the questions.json ID."""
+    problem_id = str(problem_id).strip()
+    return problem_id if problem_id.startswith('question-') else f'question-{problem_id}'
+
+def collect_batch_items():
+    """Reads a batch request into a list of (user_id, problem_id, filename, stream).
+
+    Accepts either repeated 'files' parts with matching 'user_ids'/'problem_ids'
+    (a single 'user_id' applies to every file), or an 'archive' zip holding the
+    images plus a manifest.json of {"file", "user_id", "problem_id"} entries.
+    """
+    if 'archive' in request.files:
+        archive = zipfile.ZipFile(request.files['archive'].stream)
+        manifest = json.loads(archive.read('manifest.json'))
+        items = []
+        for entry in manifest:
+            info = archive.getinfo(entry['file'])
+            if info.file_size > image_pipeline.max_upload_bytes:
+                raise UploadTooLarge(f"{entry['file']} exceeds {image_pipeline.max_upload_bytes} bytes")
+            items.append((entry['user_id'], entry['problem_id'], entry['file'], archive.open(info)))
+        return items
+
+    files = request.files.getlist('files')
+    problem_ids = request.form.getlist('problem_ids')
+    user_ids = request.form.getlist('user_ids') or [request.form.get('user_id')] * len(files)
+    if len(problem_ids) != len(files) or len(user_ids) != len(files):
+        raise ValueError('files, problem_ids and user_ids must have the same length')
+    return [(user_ids[i], problem_ids[i], f.filename, f.stream) for i, f in enumerate(files)]
+
+@problem_routes.route('/submissions/batch', methods=['POST'])
+def submit_batch():
+    # Worksheets for a whole class are far larger than a single upload
+    request.max_content_length = current_app.config['BATCH_MAX_CONTENT_LENGTH']
+    try:
+        raw_items = collect_batch_items()
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except (KeyError, ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'error': f'Invalid batch: {str(e)}'}), 400
+
+    if not raw_items:
+        return jsonify({'error': 'No files in the batch'}), 400
+    if len(raw_items) > current_app.config['BATCH_MAX_ITEMS']:
+        return jsonify({'error': f"Batch is limited to {current_app.config['BATCH_MAX_ITEMS']} items"}), 413
+    # Batches share one grading pool; refuse rather than queue behind other batches without bound
+    if not grading_queue.admit_batch(len(raw_items)):
+        return jsonify({'error': 'Too many batch items are being graded, please retry shortly'}), 429, {'Retry-After': '30'}
+
+    # Save every image up front: the request body is gone once we start streaming
+    items = []
+    for index, (user_id, problem_id, filename, stream) in enumerate(raw_items):
+        item = {'index': index, 'user_id': user_id, 'problem_id': normalize_question_id(problem_id)}
+        items.append(item)
+        try:
+            system_ans = get_system_answer(item['problem_id'])
+            if not user_id:
+                item['error'] = 'User ID is required'
+            elif system_ans is None:
+                item['error'] = f"No system answer found for problem_id {item['problem_id']}"
+            else:
+                stored = image_store.save_stream(stream, os.path.basename(filename))
+                item['file_path'] = stored.key
+                item['state'] = {
+                    "pages": [{"img_path": image_store.local_path(stored.key), "img_hash": stored.sha256}],
+                    "problem_id": item['problem_id'],
+                    "system_ans": system_ans,
+                }
+        except Exception as e:
+            item['error'] = str(e)
+    # Rejected items were admitted but will never be graded
+    grading_queue.release_batch(sum(1 for item in items if 'state' not in item))
+
+    app = current_app._get_current_object()
+    commit_size = app.config['BATCH_COMMIT_SIZE']
+
+    def grade(item):
+        with app.app_context():
+            try:
+                final_state, attempts = grading_queue.run_graph(item['state'], f"batch item {item['index']}")
+                return final_state, attempts, None
+            except GradingError as e:
+                return None, e.attempts, str(e)
+
+    def line(payload):
+        return json.dumps(payload) + '\n'
+
+    def build_submission(item, result):
+        final_state, attempts, error = result
+        return Submission(
+            problem_id=item['problem_id'],
+            user_id=item['user_id'],
+            image_path=item['file_path'],
+            image_paths=json.dumps([item['file_path']]),
+            model_output=json.dumps(final_state) if final_state else None,
+            status='failed' if error else 'done',
+            attempts=attempts,
+            error=error
+        )
+
+    def record(submission):
+        # Rating and stats move in the same transaction as the graded submission
+        if submission.status == 'done':
+            final_state = json.loads(submission.model_output)
+            apply_result(submission, final_state)
+            rating_engine.rate_submission(submission, final_state.get('final_output'))
+            submission_stats.record(submission)
+
+    def save_late(item, future):
+        # The client left while this item was grading; keep the model call's result anyway
+        if future.cancelled():
+            return
+        try:
+            with app.app_context():
+                submission = build_submission(item, future.result())
+                db.session.add(submission)
+                record(submission)
+                db.session.commit()
+                question_recommender.mark_attempted(submission.user_id, submission.problem_id)
+        except Exception as e:
+            print(f"Error saving batch item {item['index']} after disconnect: {str(e)}")
+
+    futures = {grading_queue.submit_batch_item(grade, item): item for item in items if 'state' in item}
+    reported = set()
+
+    def on_close():
+        # Runs however the response ends, even if the client left before the first line:
+        # items not started yet are dropped, ones already grading are saved when they finish
+        for future, item in futures.items():
+            if future not in reported and not future.cancel():
+                future.add_done_callback(lambda f, item=item: save_late(item, f))
+
+    def generate():
+        yield line({'event': 'start', 'total': len(items)})
+        pending = []
+
+        def flush():
+            db.session.add_all(submission for _, submission in pending)
+            for _, submission in pending:
+                record(submission)
+            db.session.commit()
+            for _, submission in pending:
+                question_recommender.mark_attempted(submission.user_id, submission.problem_id)
+            result = line({
+                'event': 'committed',
+                'submissions': [{'index': index, 'submission_id': submission.submission_id}
+                                for index, submission in pending]
+            })
+            pending.clear()
+            return result
+
+        for item in items:
+            if 'error' in item:
+                yield line({'event': 'item', 'index': item['index'], 'status': 'rejected', 'error': item['error']})
+
+        try:
+            for future in as_completed(futures):
+                reported.add(future)
+                item = futures[future]
+                final_state, attempts, error = future.result()
+                pending.append((item['index'], build_submission(item, (final_state, attempts, error))))
+                yield line({
+                    'event': 'item',
+                    'index': item['index'],
+                    'status': 'failed' if error else 'done',
+                    'error': error,
+                    'model_output': final_state
+                })
+                if len(pending) >= commit_size:
+                    yield flush()
+            if pending:
+                yield flush()
+            yield line({'event': 'done', 'total': len(items)})
+        finally:
+            if pending:
+                # Client went away: keep the items already graded instead of redoing them on retry
+                try:
+                    flush()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error saving graded batch items: {str(e)}")
+
+    response = Response(stream_with_context(generate()), status=200, mimetype='application/x-ndjson')
+    response.call_on_close(on_close)
+    return response
+
+@problem_routes.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'ocr': ocr_cache.stats(),
+        'verdict': verdict_cache.stats(),
+        'answer_check': answer_checker.stats(),
+        'recommender': question_recommender.stats()
+    }), 200
+
+@problem_routes.route('/db/stats', methods=['GET'])
+def get_db_stats():
+    return jsonify(database.stats()), 200
+
+@problem_routes.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: stage latency histograms, model usage, queue, cache and pool gauges."""
+    gauges = [('grading_queue_depth', {}, grading_queue.depth()),
+              ('answer_check_short_circuit_ratio', {}, answer_checker.stats()['short_circuit_ratio'])]
+    for name, stats in (('ocr', ocr_cache.stats()), ('verdict', verdict_cache.stats())):
+        for key in ('entries', 'hits', 'misses'):
+            gauges.append((f'cache_{key}', {'cache': name}, stats[key]))
+    for bind, stats in database.stats().items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                gauges.append((f'db_pool_{key}', {'bind': bind}, value))
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
 @problem_routes.route('/upload', methods=['POST'])
 def upload_file():
     print("Received generic file upload request")
@@ -162,22 +526,38 @@ def upload_file():
         return jsonify({'error': 'No selected file'}), 400
     
     try:
-        # Save file with secure filename in the uploads folder
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        absolute_path = os.path.abspath(file_path)
-        
-        print(f"Saving file to: {absolute_path}")
-        file.save(absolute_path)
+        # Same content-addressed store as submissions; file_path is the storage key
+        stored = image_store.save_upload(file)
+        print(f"Stored upload as {stored.key}")
         
         return jsonify({
             'message': 'File uploaded successfully',
-            'file_path': file_path
+            'file_path': stored.key,
+            'image_url': f'/images/{stored.key}'
         }), 200
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
         print(f"Error saving file: {str(e)}")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@problem_routes.route('/images/<path:key>', methods=['GET'])
+def get_image(key):
+    """Serves a stored image by key; ?thumbnail=1 returns the small JPEG preview."""
+    if not image_store.is_key(key):
+        return jsonify({'error': 'Unknown image'}), 404
+    try:
+        if request.args.get('thumbnail'):
+            key = image_store.thumbnail_key(key)
+        path = image_store.local_path(key)
+        if not os.path.exists(path):
+            return jsonify({'error': 'Unknown image'}), 404
+        # Keys are content hashes, so the bytes behind a URL never change
+        return send_file(path, max_age=365 * 24 * 3600, conditional=True)
+    except Exception as e:
+        print(f"Error serving image {key}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @problem_routes.route('/seed-problems', methods=['POST'])
 def seed_problems():
     try:
@@ -215,13 +595,17 @@ def seed_problems():
     
 @problem_routes.route('/api/get-questions', methods=['GET'])
 def get_questions():
+    """Recommends questions: ?user_id= picks near the user's rating and skips questions they attempted.
+
+    ?level= fixes the level instead, ?topic= narrows to one topic and
+    ?count= (default 3) sets how many come back.
+    """
     try:
-        level = int(request.args.get('level', 3))  # Default to 3 questions
-        with open('C:/Users/Lakshay/OneDrive/Desktop/Math Tutor/my-project/questions.json', 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        filtered_questions = [q for q in data if q.get('Level') == f'Level {level}']  # Filter by level
-        random_questions = random.sample(filtered_questions, min(3, len(filtered_questions)))
-        return jsonify(random_questions), 200
+        user_id = request.args.get('user_id', type=int)
+        level = request.args.get('level', type=int)
+        count = max(1, min(request.args.get('count', 3, type=int), current_app.config['RECOMMEND_MAX_COUNT']))
+        questions = question_recommender.recommend(user_id, count, level=level, topic=request.args.get('topic'))
+        return jsonify(questions), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
@@ -240,24 +624,18 @@ def api_upload_file():
         return jsonify({'error': 'No selected file'}), 400
     
     try:
-        # Create uploads/solutions directory if it doesn't exist
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        
-        # Save file with secure filename - add timestamp to avoid name conflicts
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = secure_filename(f"{timestamp}_{file.filename}")
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        absolute_path = os.path.abspath(file_path)
-        
-        print(f"Saving file to: {absolute_path}")
-        file.save(absolute_path)
+        # Content-addressed, so identical names or identical photos never collide
+        stored = image_store.save_upload(file)
+        print(f"Stored upload as {stored.key}")
         
         return jsonify({
             'message': 'File uploaded successfully',
-            'file_path': file_path,
+            'file_path': stored.key,
+            'image_url': f'/images/{stored.key}',
             'question_id': question_id
         }), 200
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
         print(f"Error saving file: {str(e)}")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
@@ -1,7 +1,17 @@
 from flask import Blueprint, request, jsonify, session
 from models.user import User
+from models.rating_history import RatingHistory, RatingSummary
+from services.downsample import lttb, daily_buckets
+from datetime import datetime
 from extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from routes.pagination import page_args, field_args, keyset_page, conditional_json
+from models.problem import Submission
+from services.submissions import SUBMISSION_FIELDS, row_json
+from services.stats import submission_stats
+from services.leaderboard import leaderboard
+from services.passwords import password_hasher
+from services.database import database
 
 user_routes = Blueprint('user_routes', __name__)
 
@@ -17,7 +27,7 @@ def signup():
         return jsonify({'message': 'Username already exists'}), 409
     
     # Create new user with hashed password - use consistent method
-    hashed_pw = generate_password_hash(data['password'], method='pbkdf2:sha256')
+    hashed_pw = password_hasher.hash(data['password'])
     print(f"Generated hash: {hashed_pw[:20]}...")
     
     new_user = User(
@@ -28,12 +38,9 @@ def signup():
     
     db.session.add(new_user)
     db.session.commit()
+    leaderboard.update(new_user.userid, new_user.rating_score, new_user.username)
     print(f"User created with ID: {new_user.userid}")
     
-    # Verify the hash was actually stored
-    saved_user = User.query.get(new_user.userid)
-    print(f"Saved password hash: {saved_user.password[:20]}...")
-    
     return jsonify({'message': 'User created successfully', 'userid': new_user.userid}), 201
 
 @user_routes.route('/auth/login', methods=['POST'])
@@ -66,22 +73,13 @@ def login():
         print(f"User not found: {data['username']}")
         return jsonify({'message': 'Invalid credentials'}), 401
     
-    # Check if password is stored as plain text (for older accounts)
-    if user.password == 'changeme' or not user.password.startswith(('pbkdf2:', 'scrypt:', 'bcrypt:')):
-        print(f"Using plain text password comparison for {user.username}")
-        password_matches = (user.password == data['password'])
-    else:
-        # Use hash verification for properly hashed passwords
-        print(f"Using hash verification for {user.username}")
-        try:
-            password_matches = check_password_hash(user.password, data['password'])
-        except Exception as e:
-            print(f"Error during password verification: {str(e)}")
-            password_matches = False
-    
-    if not password_matches:
+    # Older accounts may still hold a plain-text password; verify() handles both
+    if not password_hasher.verify(user.password, data['password']):
         print(f"Password verification failed for {user.username}")
         return jsonify({'message': 'Invalid credentials'}), 401
+
+    # Plain-text and outdated hashes are upgraded off the request path
+    password_hasher.rehash_later(user.userid, data['password'], user.password)
     
     print(f"Login successful for {user.username}")
     # Return user info (without password)
@@ -103,18 +101,21 @@ def create_user():
     
     new_user = User(
         username=data['username'], 
-        password=generate_password_hash(password, method='pbkdf2:sha256'),
+        password=password_hasher.hash(password),
         rating_score=data['rating_score']
     )
     
     db.session.add(new_user)
     db.session.commit()
+    leaderboard.update(new_user.userid, new_user.rating_score, new_user.username)
     return jsonify({'message': 'User created successfully'}), 201
 
 @user_routes.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([{'username': user.username, 'userid': user.userid, 'rating_score': user.rating_score} for user in users]), 200
+    after, limit = page_args()
+    query = database.read_session().query(User.userid, User.username, User.rating_score)
+    users, next_cursor = keyset_page(query, User.userid, after, limit)
+    return conditional_json([{'username': user.username, 'userid': user.userid, 'rating_score': user.rating_score} for user in users], next_cursor)
 
 @user_routes.route('/users/<int:userid>', methods=['GET'])
 def get_user(userid):
@@ -137,6 +138,24 @@ def get_user(userid):
         # Return detailed error message for debugging
         return jsonify({'message': f'Error fetching user: {str(e)}'}), 500
     
+@user_routes.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    
+    total, entries = leaderboard.page(offset, limit)
+    return jsonify({'total': total, 'offset': offset, 'limit': limit, 'entries': entries}), 200
+
+@user_routes.route('/users/<int:userid>/rank', methods=['GET'])
+def get_user_rank(userid):
+    result = leaderboard.rank(userid)
+    
+    if result is None:
+        return jsonify({'message': f'User with ID {userid} not found'}), 404
+    
+    rank, rating, total = result
+    return jsonify({'userid': userid, 'rank': rank, 'rating_score': rating, 'total': total}), 200
+
 @user_routes.route('/users/<int:userid>', methods=['PUT'])
 def update_user(userid):
     data = request.get_json()
@@ -144,6 +163,7 @@ def update_user(userid):
     user.username = data['username']
     user.rating_score = data['rating_score']
     db.session.commit()
+    leaderboard.update(user.userid, user.rating_score, user.username)
     return jsonify({'message': 'User updated successfully'}), 200
 
 @user_routes.route('/users/<int:userid>', methods=['DELETE'])
@@ -151,6 +171,7 @@ def delete_user(userid):
     user = User.query.get_or_404(userid)
     db.session.delete(user)
     db.session.commit()
+    leaderboard.remove(userid)
     return jsonify({'message': 'User deleted successfully'}), 200
 
 @user_routes.route('/debug-login', methods=['POST'])
@@ -193,16 +214,13 @@ def reset_user_password(username):
     
     # Reset password with proper hashing
     new_password = data.get('password', 'password123')
-    user.password = generate_password_hash(new_password, method='pbkdf2:sha256')
+    user.password = password_hasher.hash(new_password)
     db.session.commit()
     
-    # Verify it's stored correctly
-    updated_user = User.query.get(user.userid)
-    
     return jsonify({
         'message': 'Password reset successfully',
         'username': username,
-        'hash_preview': updated_user.password[:30] + '...'
+        'hash_preview': user.password[:30] + '...'
     }), 200
     
 @user_routes.route('/util/check-users', methods=['GET'])
@@ -241,37 +259,116 @@ def auth_reset_password():
         return jsonify({'message': 'If the username exists, the password has been reset'}), 200
     
     # Reset the password
-    user.password = generate_password_hash(data['password'], method='pbkdf2:sha256')
+    user.password = password_hasher.hash(data['password'])
     db.session.commit()
     
-    # Verify the new password hash was saved
-    updated_user = User.query.get(user.userid)
-    if not check_password_hash(updated_user.password, data['password']):
-        return jsonify({'message': 'Password reset failed'}), 500
-    
     return jsonify({'message': 'Password reset successful'}), 200
 
 # Add this new model to your models directory first
 # Then add these routes
 
+def parse_datetime_arg(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+@user_routes.route('/users/<int:userid>/submissions', methods=['GET'])
+def get_user_submissions(userid):
+    """A user's recent attempts, newest first; ?problem_id= and ?status= filter."""
+    try:
+        after, limit = page_args()
+        fields = field_args(SUBMISSION_FIELDS, 'submission_id')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        # Range read on the (user_id, submission_id) index
+        query = (database.read_session().query(*[getattr(Submission, f) for f in fields])
+                 .filter(Submission.user_id == userid))
+        problem_id = request.args.get('problem_id')
+        if problem_id:
+            problem_id = problem_id if problem_id.startswith('question-') else f'question-{problem_id}'
+            query = query.filter(Submission.problem_id == problem_id)
+        if request.args.get('status'):
+            query = query.filter(Submission.status == request.args['status'])
+
+        rows, next_cursor = keyset_page(query, Submission.submission_id, after, limit, descending=True)
+        return conditional_json([row_json(row) for row in rows], next_cursor)
+    except Exception as e:
+        print(f"Error fetching submissions for user {userid}: {str(e)}")
+        return jsonify({'message': f'Error fetching submissions: {str(e)}'}), 500
+
+@user_routes.route('/users/<int:userid>/stats', methods=['GET'])
+def get_user_stats(userid):
+    """Attempts and solve rate per topic and per difficulty, from the user's summary rows."""
+    try:
+        session = database.read_session()
+        stats = submission_stats.user(userid, session)
+        if not stats['topic'] and not session.get(User, userid):
+            return jsonify({'message': f'User with ID {userid} not found'}), 404
+        return jsonify({'userid': userid, **stats}), 200
+    except Exception as e:
+        print(f"Error fetching stats for user {userid}: {str(e)}")
+        return jsonify({'message': f'Error fetching stats: {str(e)}'}), 500
+
 @user_routes.route('/users/<int:userid>/rating-history', methods=['GET'])
 def get_user_rating_history(userid):
-    user = User.query.get_or_404(userid)
+    """Rating points for charts, optionally limited to ?from=&to= (ISO dates).
+
+    Series longer than ?max_points= are downsampled server-side: mode=lttb
+    (default) keeps the visual shape, mode=daily returns min/max/last per day
+    (LTTB-sampled by day when there are more days than max_points).
+    """
+    try:
+        start = parse_datetime_arg('from')
+        end = parse_datetime_arg('to')
+    except ValueError as e:
+        return jsonify({'message': f'Invalid date: {str(e)}'}), 400
+    max_points = max(3, min(request.args.get('max_points', 500, type=int), 5000))
+    mode = request.args.get('mode', 'lttb')
+    if mode not in ('lttb', 'daily'):
+        return jsonify({'message': "mode must be 'lttb' or 'daily'"}), 400
+
+    session = database.read_session()
+    # Primary-key read; users without history never touch the history table
+    summary = session.get(RatingSummary, userid)
+    if summary is None:
+        if not session.get(User, userid):
+            return jsonify({'message': f'User with ID {userid} not found'}), 404
+        return jsonify([]), 200
+
+    # Single range read on the (user_id, date, rating) index
+    query = (session.query(RatingHistory.date, RatingHistory.rating)
+             .filter(RatingHistory.user_id == userid))
+    if start:
+        query = query.filter(RatingHistory.date >= start)
+    if end:
+        query = query.filter(RatingHistory.date <= end)
+    points = query.order_by(RatingHistory.date, RatingHistory.id).all()
+
+    if mode == 'daily':
+        buckets = daily_buckets(points)
+        if len(buckets) > max_points:
+            # Same shape-preserving sampling as the raw series, so long ranges keep their oldest days
+            sampled = lttb([(datetime.fromisoformat(bucket['date']).toordinal(), bucket['rating'], bucket)
+                            for bucket in buckets], max_points)
+            buckets = [bucket for _, _, bucket in sampled]
+        return jsonify(buckets), 200
+
+    if len(points) > max_points:
+        sampled = lttb([(date.timestamp(), rating, date) for date, rating in points], max_points)
+        points = [(date, rating) for _, rating, date in sampled]
     
-    # For now, return mock data
-    # In production, you'd query this from the database
-    mock_history = [
-        {"date": "2025-01-15", "rating": 0},
-        {"date": "2025-01-20", "rating": 3},
-        {"date": "2025-02-01", "rating": 2.5},
-        {"date": "2025-02-10", "rating": 4},
-        {"date": "2025-02-20", "rating": 3.5},
-        {"date": "2025-03-01", "rating": 5},
-        {"date": "2025-03-15", "rating": 7},
-        {"date": "2025-03-25", "rating": 9}
-    ]
-    
-    return jsonify(mock_history), 200
+    return jsonify([{'date': date.isoformat(), 'rating': rating} for date, rating in points]), 200
+
+@user_routes.route('/users/<int:userid>/rating-summary', methods=['GET'])
+def get_user_rating_summary(userid):
+    session = database.read_session()
+    summary = session.get(RatingSummary, userid)
+    if summary is None:
+        if not session.get(User, userid):
+            return jsonify({'message': f'User with ID {userid} not found'}), 404
+        return jsonify(RatingSummary(points=0).to_dict()), 200
+    return jsonify(summary.to_dict()), 200
 
 @user_routes.route('/users/<int:userid>/profile-image', methods=['POST'])
 def update_profile_image(userid):
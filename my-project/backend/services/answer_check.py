@@ -0,0 +1,311 @@
+import ast
+import math
+import operator
+import re
+import threading
+from dataclasses import dataclass
+
+from services.metrics import metrics
+from services.verdict_cache import CHAR_MAP, OCR_PREFIX
+
+# Phrases that introduce a final answer in a handwritten solution
+ANSWER_PHRASE = re.compile(r'(?:\b(?:final answer|answer|ans|therefore|thus|hence)\b|∴)\s*(?:is|=|:)?\s*(.+)$', re.IGNORECASE)
+
+# LaTeX that carries no value: spacing, sizing, math-mode delimiters
+NOISE = re.compile(r'\\left|\\right|\\displaystyle|\\[,;:! ]|\\quad|\\qquad|\$|\\\(|\\\)|\\\[|\\\]')
+TEXT_BLOCK = re.compile(r'\\(?:text|textbf|mathrm|mbox)\{([^{}]*)\}')
+DEGREES = re.compile(r'\^\s*\{?\\circ\}?|°')
+LEADING_VARIABLE = re.compile(r'^[a-z]\s*=\s*')
+VARIABLE_ANSWER = re.compile(r'^[a-z]\s*=\s*([^=]+)$', re.IGNORECASE)  # 'x = 5', not 'x^2 - 4 = 0'
+THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}\b)')
+FRAC = re.compile(r'\\frac\{([^{}]*)\}\{([^{}]*)\}')
+ROOT = re.compile(r'\\sqrt\[([^\]]*)\]\{([^{}]*)\}')
+SQRT = re.compile(r'\\sqrt\{([^{}]*)\}')
+
+# After translation an expression may only use these names; anything else is left to the model
+FUNCTIONS = {'sqrt': math.sqrt}
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+EXPRESSION = re.compile(r'^[0-9a-z+\-*/().^ ]+$')
+NAME = re.compile(r'[a-z]+')
+POWER_TOWER = re.compile(r'\*\*\(?[\d.]+\)?\*\*')
+MAX_EXPRESSION_CHARS = 120
+MAX_EXPONENT = 64
+
+BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+          ast.Div: operator.truediv, ast.Pow: operator.pow}
+UNARY = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+# Only the final answer was checked, so the approach gets its own verdict (and credit), not CORRECT
+VERDICT = ("The final answer {human} matches the system's answer {system} ({method} check, no model call). "
+           "The working was not reviewed; resubmit with detailed feedback to have it checked.\n\n"
+           "The human's solution approach is **NOT CHECKED** and the final answer **MATCHES** the system's answer.")
+
+
+def last_boxed(text):
+    """Contents of the last \\boxed{...} (or \\fbox{...}) in text, braces balanced."""
+    start = max(text.rfind('\\boxed{'), text.rfind('\\fbox{'))
+    if start == -1:
+        return None
+    i = text.index('{', start) + 1
+    depth = 1
+    for j in range(i, len(text)):
+        if text[j] == '{':
+            depth += 1
+        elif text[j] == '}':
+            depth -= 1
+            if depth == 0:
+                return text[i:j]
+    return None
+
+
+def extract_final_answer(text):
+    """The final answer in a solution: \\boxed{}, an 'answer is' line, or a last line like 'x = 5'.
+
+    Any other equation on the last line (x^2 - 4 = 0) is working, not an
+    answer, so it returns None and the model grades the solution.
+    """
+    text = OCR_PREFIX.sub('', text or '').strip()
+    boxed = last_boxed(text)
+    if boxed is not None:
+        return boxed
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for line in reversed(lines):
+        match = ANSWER_PHRASE.search(line)
+        if match:
+            return match.group(1)
+    if lines:
+        match = VARIABLE_ANSWER.match(lines[-1])
+        if match:
+            return match.group(1)
+    return None
+
+
+def split_top_level(text):
+    """Splits on commas outside brackets, so '(1, 2), 3' is two items."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [part for part in parts if part.strip()]
+
+
+def normalize(answer):
+    """Canonical string form of one answer: LaTeX noise, units and 'x =' removed."""
+    text = answer.translate(CHAR_MAP).strip().rstrip('.')
+    text = NOISE.sub('', text)
+    text = DEGREES.sub('', text)
+    text = TEXT_BLOCK.sub(lambda m: '' if m.group(1).strip().isalpha() else m.group(1), text)
+    text = text.replace('\\dfrac', '\\frac').replace('\\tfrac', '\\frac').replace('\\%', '').replace('%', '')
+    text = re.sub(r'\\frac(\d)(\d)', r'\\frac{\1}{\2}', text)  # MATH shorthand \frac12
+    text = re.sub(r'\\sqrt(\d)', r'\\sqrt{\1}', text)
+    text = re.sub(r'√\s*(\d+|[a-z]|\([^()]*\))', r'\\sqrt{\1}', text)  # handwritten radical
+    text = re.sub(r'\s+', '', text.lower())
+    return LEADING_VARIABLE.sub('', text)
+
+
+def to_expression(text):
+    """Translates a normalized answer into Python arithmetic, or None if it is not plain arithmetic."""
+    # Innermost first, until nothing changes: \frac{\sqrt{3}}{2} needs two passes
+    previous = None
+    while text != previous:
+        previous = text
+        text = FRAC.sub(r'((\1)/(\2))', text)
+        text = ROOT.sub(r'((\2)**(1/(\1)))', text)
+        text = SQRT.sub(r'sqrt(\1)', text)
+    text = text.replace('\\pi', 'pi').replace('\\cdot', '*').replace('\\times', '*')
+    text = text.replace('{', '(').replace('}', ')').replace('^', '**')
+    if '\\' in text or len(text) > MAX_EXPRESSION_CHARS or not EXPRESSION.match(text):
+        return None
+    # Implicit multiplication: 2sqrt(3), 2pi, 3(x+1), )(
+    text = re.sub(r'(\d|\))(?=[a-z(])', r'\1*', text)
+    text = re.sub(r'\)(?=\d)', ')*', text)
+    return text
+
+
+def evaluate(expression):
+    """Evaluates arithmetic over numbers, pi, e and sqrt without eval(); None if it has anything else."""
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value)
+        if isinstance(node, ast.Name) and node.id in CONSTANTS:
+            return CONSTANTS[node.id]
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY:
+            return UNARY[type(node.op)](visit(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY:
+            left, right = visit(node.left), visit(node.right)
+            if isinstance(node.op, ast.Pow) and abs(right) > MAX_EXPONENT:
+                raise ValueError('exponent too large')
+            return BINARY[type(node.op)](left, right)
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+                and len(node.args) == 1 and not node.keywords):
+            return FUNCTIONS[node.func.id](visit(node.args[0]))
+        raise ValueError('unsupported expression')
+
+    try:
+        value = visit(ast.parse(expression, mode='eval'))
+    except (SyntaxError, ValueError, ZeroDivisionError, OverflowError, TypeError):
+        return None
+    return value if isinstance(value, float) and math.isfinite(value) else None
+
+
+@dataclass
+class Answer:
+    text: str           # the answer as written
+    items: list         # normalized strings, one per comma-separated value
+    expressions: list   # Python arithmetic per item, or None
+    values: list        # float per item, or None where it has variables or is not arithmetic
+
+
+def parse_answer(text):
+    if text is None:
+        return None
+    # 12,345 is one number, not two answers
+    items = [normalize(item) for item in split_top_level(THOUSANDS.sub('', text.strip()))]
+    items = [item for item in items if item]
+    if not items:
+        return None
+    expressions = [to_expression(item) for item in items]
+    values = [evaluate(expression) if expression else None for expression in expressions]
+    return Answer(text.strip(), items, expressions, values)
+
+
+class AnswerChecker:
+    """Local final-answer check that runs before the compare model.
+
+    The final answer is pulled out of the transcription and of the
+    question's Solution (its last \\boxed{}), normalized, and compared as
+    strings, then numerically, then symbolically with SymPy when it is
+    installed and the answers have variables. A confident match becomes the
+    verdict without a model call; anything else (a mismatch, which still
+    deserves feedback, or an answer that could not be read) goes to the
+    compare model as before. The parsed system side is cached per question.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.tolerance = 1e-6
+        self._lock = threading.Lock()
+        self._system = {}  # problem_id -> (solution text, Answer or None)
+        self._outcomes = {}
+        self._sympy = None
+
+    def init_app(self, app):
+        self.enabled = app.config['ANSWER_CHECK_ENABLED']
+        self.tolerance = app.config['ANSWER_CHECK_TOLERANCE']
+
+    def system_answer(self, problem_id, solution):
+        cached = self._system.get(problem_id)
+        # The question bank hot-reloads, so a changed Solution re-parses
+        if cached is not None and cached[0] == solution:
+            return cached[1]
+        answer = parse_answer(last_boxed(solution or '') or extract_final_answer(solution))
+        with self._lock:
+            self._system[problem_id] = (solution, answer)
+        return answer
+
+    def check(self, problem_id, human_text, solution):
+        """Returns {'outcome': 'match'|'mismatch'|'unparsed', ...}; only 'match' is confident enough to skip the model."""
+        system = self.system_answer(problem_id, solution)
+        human = parse_answer(extract_final_answer(human_text))
+        if system is None or human is None:
+            return {'outcome': 'unparsed'}
+
+        result = {'human': human.text, 'system': system.text}
+        if human.items == system.items:
+            return {**result, 'outcome': 'match', 'method': 'exact'}
+        if len(human.items) != len(system.items):
+            return {**result, 'outcome': 'mismatch'}
+
+        # Lists of values (roots, coordinates) may come in any order
+        methods = set()
+        unmatched = list(range(len(system.items)))
+        for i in range(len(human.items)):
+            for j in unmatched:
+                method = self._equal(human, i, system, j)
+                if method:
+                    methods.add(method)
+                    unmatched.remove(j)
+                    break
+            else:
+                decided = all(value is not None for value in human.values + system.values)
+                return {**result, 'outcome': 'mismatch' if decided else 'unparsed'}
+        method = 'symbolic' if 'symbolic' in methods else 'numeric' if 'numeric' in methods else 'exact'
+        return {**result, 'outcome': 'match', 'method': method}
+
+    def _equal(self, human, i, system, j):
+        if human.items[i] == system.items[j]:
+            return 'exact'
+        a, b = human.values[i], system.values[j]
+        if a is not None and b is not None:
+            return 'numeric' if abs(a - b) <= self.tolerance * max(1.0, abs(b)) else None
+        if human.expressions[i] and system.expressions[j] and self._symbolic_equal(human.expressions[i], system.expressions[j]):
+            return 'symbolic'
+        return None
+
+    def _symbolic_equal(self, left, right):
+        sympy = self._load_sympy()
+        if sympy is None:
+            return False
+        names = set(NAME.findall(left)) | set(NAME.findall(right))
+        # Only single-letter variables; longer words are prose the model should judge
+        if any(len(name) > 1 and name not in FUNCTIONS and name not in CONSTANTS for name in names):
+            return False
+        # 9**9**9 would take SymPy forever; nothing in the question bank needs it
+        if POWER_TOWER.search(left) or POWER_TOWER.search(right):
+            return False
+        namespace = {name: sympy.Symbol(name) for name in names if len(name) == 1}
+        namespace.update({'sqrt': sympy.sqrt, 'pi': sympy.pi, 'e': sympy.E})
+        try:
+            difference = sympy.sympify(f'({left}) - ({right})', locals=namespace)
+            return sympy.simplify(difference) == 0
+        except Exception:
+            return False
+
+    def _load_sympy(self):
+        # Optional: without SymPy, answers with variables are left to the model
+        if self._sympy is None:
+            try:
+                import sympy
+                self._sympy = sympy
+            except ImportError:
+                self._sympy = False
+        return self._sympy or None
+
+    def record(self, outcome, short_circuited):
+        metrics.inc('answer_checks_total', outcome=outcome)
+        with self._lock:
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+            if short_circuited:
+                self._outcomes['short_circuited'] = self._outcomes.get('short_circuited', 0) + 1
+
+    def verdict(self, result):
+        return VERDICT.format(human=result['human'], system=result['system'], method=result['method'])
+
+    def stats(self):
+        with self._lock:
+            outcomes = dict(self._outcomes)
+        short_circuited = outcomes.pop('short_circuited', 0)
+        checked = sum(outcomes.values())
+        return {
+            'enabled': self.enabled,
+            'sympy': self._load_sympy() is not None,
+            'checked': checked,
+            'outcomes': outcomes,
+            'short_circuited': short_circuited,
+            'short_circuit_ratio': round(short_circuited / checked, 4) if checked else 0.0,
+            'questions_parsed': len(self._system),
+        }
+
+
+answer_checker = AnswerChecker()
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+from services.grading_queue import GradingError, is_transient
+
+
+class AsyncGrader:
+    """Runs the grading graph with graph.ainvoke on one background event loop.
+
+    Many gradings can be in flight at once without a thread each; a
+    semaphore caps concurrency and every run has a timeout. submit() hands
+    back a concurrent.futures.Future so plain threads can wait on, or
+    cancel, a grading.
+    """
+
+    def __init__(self):
+        self.concurrency = 32
+        self.timeout = 120.0
+        self.max_retries = 3
+        self.retry_backoff = 2.0
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.concurrency = app.config['ASYNC_GRADING_CONCURRENCY']
+        self.timeout = app.config['ASYNC_GRADING_TIMEOUT']
+        self.max_retries = app.config['GRADING_MAX_RETRIES']
+        self.retry_backoff = app.config['GRADING_RETRY_BACKOFF']
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-grader', daemon=True).start()
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                self._loop = loop
+        return self._loop
+
+    async def arun_graph(self, state, label='submission'):
+        """Async twin of GradingQueue.run_graph: (final_state, attempts) or GradingError."""
+        # Imported here so the model client is only built by processes that grade
+        from routes.ocr import get_graph
+        graph = get_graph()
+
+        attempts = 0
+        async with self._semaphore:
+            while True:
+                attempts += 1
+                try:
+                    return await asyncio.wait_for(graph.ainvoke(state), self.timeout), attempts
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        e = TimeoutError(f'Grading timed out after {self.timeout}s')
+                    if not is_transient(e) or attempts > self.max_retries:
+                        print(f"Error running model pipeline: {str(e)}")
+                        raise GradingError(f'Model processing error: {str(e)}', attempts) from e
+
+                    delay = self.retry_backoff * 2 ** (attempts - 1)
+                    print(f"Transient model error on {label} (attempt {attempts}), "
+                          f"retrying in {delay:.1f}s: {str(e)}")
+                    await asyncio.sleep(delay)
+
+    def submit(self, coro):
+        """Schedules a coroutine on the grading loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run_graph(self, state, label='submission'):
+        return self.submit(self.arun_graph(state, label))
+
+
+async_grader = AsyncGrader()
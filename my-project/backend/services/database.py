@@ -0,0 +1,136 @@
+import threading
+import time
+
+from flask import g
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from extensions import db
+
+REPLICA_BIND = 'replica'
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'checked_out': self.checkedout(),
+                'checked_in': self.checkedin(),
+                'overflow': self.overflow(),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.wait_seconds, 6),
+                'wait_seconds_max': round(self.max_wait_seconds, 6),
+            }
+
+
+def _uncap_statements(dbapi_connection, connection_record):
+    # Runs after the connection's init_command set the request timeout
+    cursor = dbapi_connection.cursor()
+    cursor.execute('SET SESSION max_execution_time=0')
+    cursor.close()
+
+
+class DatabasePools:
+    """Connection pool settings, read-replica routing and pool metrics.
+
+    init_app must run before db.init_app: it turns the DB_* settings into
+    SQLALCHEMY_ENGINE_OPTIONS and, when DATABASE_REPLICA_URL is set, adds a
+    'replica' bind with the same options. Read-only endpoints query through
+    read_session(), which falls back to db.session without a replica.
+    """
+
+    def init_app(self, app):
+        config = app.config
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = self.engine_options(config, config['SQLALCHEMY_DATABASE_URI'])
+        replica_url = config.get('DATABASE_REPLICA_URL')
+        if replica_url:
+            binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+            binds[REPLICA_BIND] = {'url': replica_url, **self.engine_options(config, replica_url)}
+            config['SQLALCHEMY_BINDS'] = binds
+        app.teardown_appcontext(self._close_read_session)
+
+    def engine_options(self, config, url):
+        url = make_url(url)
+        if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+            return {}  # In-memory SQLite needs Flask-SQLAlchemy's single shared connection
+
+        options = {
+            'poolclass': TimedQueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        }
+        # MySQL's max_execution_time caps read-only SELECTs, in milliseconds;
+        # maintenance commands lift it with lift_statement_timeout()
+        if url.get_backend_name() == 'mysql' and config['DB_STATEMENT_TIMEOUT_MS']:
+            options['connect_args'] = {
+                'init_command': f"SET SESSION max_execution_time={int(config['DB_STATEMENT_TIMEOUT_MS'])}"
+            }
+        return options
+
+    def lift_statement_timeout(self):
+        """Removes the DB_STATEMENT_TIMEOUT_MS cap for the rest of this process.
+
+        For CLI commands whose full-table SELECTs are expected to run long.
+        Pooled connections are dropped so every new one is opened uncapped.
+        """
+        for engine in db.engines.values():
+            if engine.dialect.name == 'mysql':
+                event.listen(engine, 'connect', _uncap_statements)
+                engine.dispose()
+
+    def read_session(self):
+        """Session for read-only queries: the replica if configured, else db.session."""
+        engine = db.engines.get(REPLICA_BIND)
+        if engine is None:
+            return db.session
+        if 'read_session' not in g:
+            g.read_session = Session(engine)
+        return g.read_session
+
+    def _close_read_session(self, error=None):
+        session = g.pop('read_session', None)
+        if session is not None:
+            session.close()
+
+    def stats(self):
+        """Pool usage per engine, keyed 'default' or by bind name."""
+        result = {}
+        for bind_key, engine in db.engines.items():
+            pool = engine.pool
+            result[bind_key or 'default'] = pool.stats() if isinstance(pool, TimedQueuePool) else {'status': pool.status()}
+        return result
+
+
+database = DatabasePools()
@@ -0,0 +1,56 @@
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y, ...) points sorted by x.
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with its neighbours, which preserves
+    the visual shape of the series far better than striding.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket stands in for the point after this one
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        ax, ay = points[a][0], points[a][1]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            x, y = points[j][0], points[j][1]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def daily_buckets(points):
+    """Collapses (datetime, y) points into one {date, min, max, rating} per day; rating is the day's last value."""
+    buckets = []
+    for date, rating in points:
+        day = date.date()
+        if buckets and buckets[-1]['date'] == day:
+            bucket = buckets[-1]
+            bucket['min'] = min(bucket['min'], rating)
+            bucket['max'] = max(bucket['max'], rating)
+            bucket['rating'] = rating
+        else:
+            buckets.append({'date': day, 'min': rating, 'max': rating, 'rating': rating})
+    for bucket in buckets:
+        bucket['date'] = bucket['date'].isoformat()
+    return buckets
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic stand-in for a hosted model: sleeps, then returns a canned reply.
+
+    Used to load-test the submission path without network access.
+    """
+
+    response: str
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return 'fake'
+
+    def _result(self, messages):
+        # Word counts stand in for tokens so usage metrics have something to count
+        input_tokens = sum(len(str(message.content).split()) for message in messages)
+        output_tokens = len(self.response.split())
+        message = AIMessage(self.response, usage_metadata={
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': input_tokens + output_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Spread the latency over word-sized chunks, like a real token stream
+        words = self.response.split(' ')
+        for i, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(word if i == 0 else ' ' + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,447 @@
+import asyncio
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select
+
+from extensions import db
+from models.problem import GradingWorker, Submission
+from services.metrics import metrics
+from services.rating import rating_engine
+from services.stats import submission_stats
+from services.submissions import apply_result
+
+# Errors worth retrying: rate limits, timeouts and 5xx responses from the model API
+TRANSIENT_ERRORS = (
+    'ResourceExhausted',
+    'ServiceUnavailable',
+    'DeadlineExceeded',
+    'InternalServerError',
+    'TooManyRequests',
+    'TimeoutError',
+    'ConnectionError',
+)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class GradingError(Exception):
+    def __init__(self, message, attempts):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+def is_transient(error):
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class GradingQueue:
+    """Bounded queue of submissions graded in the background.
+
+    Request handlers persist the submission and enqueue it. In 'threads'
+    mode a pool of worker threads runs the OCR/compare graph synchronously;
+    in 'async' mode a single dispatcher hands jobs to the AsyncGrader event
+    loop so dozens can be in flight at once. Either way the result is
+    written back to the Submission row.
+
+    The queue itself is in memory, so each row records the worker_id of the
+    process holding it, and every process heartbeats a GradingWorker row.
+    Rows whose process has not heartbeated for GRADING_STALE_SECONDS were
+    lost with it and are marked failed, so pollers see a final status;
+    rows of live processes are never touched, however long they wait.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.mode = 'threads'
+        self._queue = None
+        self._workers = []
+        self._lock = threading.Lock()
+        self._cancelled = set()
+        self._in_flight = {}  # submission_id -> concurrent Future (async mode)
+        self._started_pid = None
+        self._worker_id = None
+        self._worker_pid = None
+        self._batch_pool = None
+        self._batch_pending = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config['GRADING_MODE']
+        self.max_retries = app.config['GRADING_MAX_RETRIES']
+        self.retry_backoff = app.config['GRADING_RETRY_BACKOFF']
+        self.stale_after = app.config['GRADING_STALE_SECONDS']
+        self.heartbeat_interval = app.config['GRADING_HEARTBEAT_SECONDS']
+        self._queue = queue.Queue(maxsize=app.config['GRADING_QUEUE_MAX_DEPTH'])
+
+        self.workers = app.config['GRADING_WORKERS']
+        # One pool for every batch request, so concurrent batches share BATCH_MAX_CONCURRENCY
+        # model calls; its threads are created on first use, in the worker process
+        self._batch_pool = ThreadPoolExecutor(max_workers=app.config['BATCH_MAX_CONCURRENCY'],
+                                              thread_name_prefix='batch')
+        self.batch_max_pending = app.config['BATCH_MAX_PENDING']
+        self.stream_max = app.config['STREAM_MAX_CONCURRENCY']
+        self._streams_open = 0
+        if self.mode == 'async':
+            # Jobs leave the queue only when the event loop has a free slot
+            self._slots = threading.BoundedSemaphore(app.config['ASYNC_GRADING_CONCURRENCY'])
+
+    @property
+    def worker_id(self):
+        """Identifies this process on the rows it queues; the token tells apart a reused pid."""
+        if self._worker_pid != os.getpid():
+            self._worker_id = f'{socket.gethostname()[:60]}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+            self._worker_pid = os.getpid()
+        return self._worker_id
+
+    def start(self):
+        """Starts this process's workers and heartbeat thread if they are not running yet."""
+        # Threads do not survive fork, so each process starts its own workers
+        # (from gunicorn.conf.py, or on first use) rather than inheriting dead
+        # ones from a preloading master
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            targets = [self._dispatch] if self.mode == 'async' else [self._run] * self.workers
+            self._workers = []
+            for i, target in enumerate(targets):
+                worker = threading.Thread(target=target, name=f'grading-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            threading.Thread(target=self._heartbeat_loop, name='grading-heartbeat', daemon=True).start()
+            self._started_pid = os.getpid()
+
+    def is_full(self):
+        return self._queue.full()
+
+    def can_stream(self):
+        """False when a streamed grading would find neither a stream slot nor room in the queue."""
+        with self._lock:
+            if self._streams_open < self.stream_max:
+                return True
+        return not self._queue.full()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def enqueue(self, submission_id, state):
+        """Queues a submission for grading; raises QueueFullError when at capacity."""
+        self.start()
+        try:
+            self._queue.put_nowait((submission_id, state, time.monotonic()))
+        except queue.Full:
+            raise QueueFullError(f'Grading queue is full ({self._queue.maxsize} pending)')
+
+    def admit_batch(self, count):
+        """Reserves room for count batch items; False when batches already hold BATCH_MAX_PENDING."""
+        with self._lock:
+            if self._batch_pending + count > self.batch_max_pending:
+                return False
+            self._batch_pending += count
+            return True
+
+    def release_batch(self, count):
+        with self._lock:
+            self._batch_pending -= count
+
+    def submit_batch_item(self, fn, *args):
+        """Runs one admitted batch item on the shared pool; its slot frees when it finishes or is cancelled."""
+        future = self._batch_pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self.release_batch(1))
+        return future
+
+    def heartbeat(self):
+        """Records that this process is alive and still grading the rows it owns."""
+        now = datetime.utcnow()
+        with self.app.app_context():
+            updated = (GradingWorker.query.filter_by(worker_id=self.worker_id)
+                       .update({'heartbeat_at': now}, synchronize_session=False))
+            if not updated:
+                db.session.add(GradingWorker(worker_id=self.worker_id, heartbeat_at=now))
+            db.session.commit()
+
+    def recover_stale(self):
+        """Fails queued or running submissions whose process stopped heartbeating; returns how many.
+
+        Rows from before worker_id was recorded have no owner and are failed
+        once they are older than stale_after.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with self.app.app_context():
+            live = select(GradingWorker.worker_id).where(GradingWorker.heartbeat_at >= cutoff)
+            recovered = (Submission.query
+                         .filter(Submission.status.in_(('queued', 'running')),
+                                 Submission.submitted_at < cutoff,
+                                 or_(Submission.worker_id.is_(None), Submission.worker_id.notin_(live)))
+                         .update({'status': 'failed',
+                                  'error': 'Grading was interrupted by a server restart, please resubmit'},
+                                 synchronize_session=False))
+            GradingWorker.query.filter(GradingWorker.heartbeat_at < cutoff).delete(synchronize_session=False)
+            db.session.commit()
+        if recovered:
+            print(f"Marked {recovered} interrupted submissions as failed")
+        return recovered
+
+    def _heartbeat_loop(self):
+        while True:
+            try:
+                self.heartbeat()
+                self.recover_stale()
+            except Exception as e:
+                print(f"Error in grading heartbeat: {str(e)}")
+            time.sleep(self.heartbeat_interval)
+
+    def cancel(self, submission_id):
+        """Stops a queued or (in async mode) running grading.
+
+        Queued jobs are skipped when dequeued; a synchronous graph run that has
+        already started cannot be interrupted and finishes unrecorded.
+        """
+        with self._lock:
+            self._cancelled.add(submission_id)
+            future = self._in_flight.get(submission_id)
+        if future is not None:
+            future.cancel()
+
+    def _take_cancelled(self, submission_id):
+        with self._lock:
+            if submission_id in self._cancelled:
+                self._cancelled.discard(submission_id)
+                return True
+            return False
+
+    def _run(self):
+        while True:
+            submission_id, state, enqueued_at = self._queue.get()
+            try:
+                if self._take_cancelled(submission_id):
+                    continue
+                with self.app.app_context():
+                    self._grade(submission_id, state, enqueued_at)
+            except Exception as e:
+                print(f"Error grading submission {submission_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _dispatch(self):
+        from services.async_grader import async_grader
+
+        while True:
+            submission_id, state, enqueued_at = self._queue.get()
+            self._queue.task_done()
+            if self._take_cancelled(submission_id):
+                continue
+
+            self._slots.acquire()
+            future = async_grader.submit(self._agrade(submission_id, state, enqueued_at))
+            with self._lock:
+                self._in_flight[submission_id] = future
+            future.add_done_callback(lambda f, sid=submission_id: self._finish(sid, f))
+
+    def _finish(self, submission_id, future):
+        with self._lock:
+            self._in_flight.pop(submission_id, None)
+            self._cancelled.discard(submission_id)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error grading submission {submission_id}: {str(future.exception())}")
+
+    def run_graph(self, state, label='submission'):
+        """Invokes the OCR/compare graph, retrying transient model errors.
+
+        Returns (final_state, attempts); raises GradingError once retries run out.
+        """
+        # Imported here so the model client is only built by processes that grade
+        from routes.ocr import get_graph
+        graph = get_graph()
+
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                return graph.invoke(state), attempts
+            except Exception as e:
+                if not is_transient(e) or attempts > self.max_retries:
+                    print(f"Error running model pipeline: {str(e)}")
+                    raise GradingError(f'Model processing error: {str(e)}', attempts) from e
+
+                delay = self.retry_backoff * 2 ** (attempts - 1)
+                print(f"Transient model error on {label} (attempt {attempts}), "
+                      f"retrying in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
+
+    def stream(self, submission_id, state):
+        """Grades in the calling thread, yielding (event, data) pairs as results arrive.
+
+        'ocr_page' carries each page's transcription as soon as OCR (or the
+        OCR cache) is done with it, 'ocr' the merged transcription, 'token' each piece of the verdict as the compare model
+        generates it, then 'done' or 'error'. Output already sent cannot be
+        taken back, so streamed runs are not retried. If the consumer stops
+        early (the client disconnected) the run is abandoned and the
+        submission cancelled. When STREAM_MAX_CONCURRENCY streams are open,
+        the submission goes to the background queue and 'queued' is yielded.
+        """
+        self.start()  # the heartbeat keeps other processes from failing this row mid-stream
+        timings = {**(state.get('timings') or {}), 'queue_wait': 0.0}
+        with self._lock:
+            slot = self._streams_open < self.stream_max
+            if slot:
+                self._streams_open += 1
+        if not slot:
+            try:
+                self.enqueue(submission_id, state)
+            except QueueFullError as e:
+                self._save_result(submission_id, None, 0, str(e), timings)
+                yield 'error', {'error': str(e)}
+                return
+            yield 'queued', {'status_url': f'/submissions/{submission_id}'}
+            return
+
+        finished = False
+        try:
+            if not self._mark_running(submission_id):
+                finished = True
+                yield 'error', {'error': 'Submission no longer needs grading'}
+                return
+
+            from routes.ocr import get_graph
+            final_state = None
+            cached_pages = []
+            try:
+                for mode, chunk in get_graph().stream(state, stream_mode=['updates', 'messages', 'values']):
+                    if mode == 'values':
+                        final_state = chunk
+                    elif mode == 'updates':
+                        for node, update in chunk.items():
+                            for page in (update or {}).get('page_outputs', []):
+                                cached_pages.append(page['cached'])
+                                yield 'ocr_page', {'page': page['page'], 'ocr_output': page['ocr_output'],
+                                                   'cached': page['cached']}
+                            if node == 'merge_pages':
+                                yield 'ocr', {'ocr_output': update['ocr_output'], 'pages': len(cached_pages),
+                                              'cached': all(cached_pages)}
+                    else:
+                        message, metadata = chunk
+                        if metadata.get('langgraph_node') == 'compare' and isinstance(message.content, str) and message.content:
+                            yield 'token', {'text': message.content}
+            except Exception as e:
+                finished = True
+                print(f"Error running model pipeline: {str(e)}")
+                error = f'Model processing error: {str(e)}'
+                self._save_result(submission_id, None, 1, error, timings)
+                yield 'error', {'error': error}
+                return
+
+            finished = True
+            self._save_result(submission_id, final_state, 1, None, timings)
+            yield 'done', {'final_output': final_state.get('final_output')}
+        finally:
+            with self._lock:
+                self._streams_open -= 1
+            if not finished:
+                self.abandon(submission_id)
+
+    def abandon(self, submission_id):
+        """Cancels a streamed submission whose client went away; finished ones are left alone."""
+        with self.app.app_context():
+            submission = Submission.query.get(submission_id)
+            if submission is not None and submission.status in ('queued', 'running'):
+                submission.status = 'cancelled'
+                submission.error = 'Client disconnected before grading finished'
+                db.session.commit()
+                print(f"Submission {submission_id} abandoned by its stream")
+
+    def _mark_running(self, submission_id):
+        with self.app.app_context():
+            submission = Submission.query.get(submission_id)
+            if submission is None or submission.status != 'queued':
+                # Deleted, cancelled, or already failed by recovery: never grade it late
+                return False
+            submission.status = 'running'
+            db.session.commit()
+            return True
+
+    def _queue_timings(self, state, enqueued_at):
+        """Request-side stage timings carried in the state, plus time spent queued."""
+        waited = time.monotonic() - enqueued_at
+        metrics.observe('grading_stage_seconds', waited, stage='queue_wait')
+        return {**(state.get('timings') or {}), 'queue_wait': round(waited * 1000, 1)}
+
+    def _save_result(self, submission_id, final_state, attempts, error, timings):
+        timings = {**timings, **((final_state or {}).get('timings') or {})}
+        with self.app.app_context():
+            submission = Submission.query.get(submission_id)
+            if submission is None or submission.status not in ('queued', 'running'):
+                # Cancelled, or already failed by recovery and possibly resubmitted: never rate it late
+                return
+
+            submission.attempts = attempts
+            if error:
+                submission.status = 'failed'
+                submission.error = error
+            else:
+                submission.model_output = json.dumps(final_state)
+                apply_result(submission, final_state, timings)
+                submission.status = 'done'
+                submission.error = None
+                # Rating and stats move in the same transaction as the graded submission
+                rating_engine.rate_submission(submission, final_state.get('final_output'))
+                submission_stats.record(submission)
+            status, problem_id = submission.status, submission.problem_id
+            with metrics.span('save_result', timings):
+                db.session.commit()
+
+        metrics.inc('submissions_graded_total', status=status)
+        # One structured line per submission for log-based dashboards
+        print(json.dumps({
+            'event': 'submission_graded',
+            'submission_id': submission_id,
+            'problem_id': problem_id,
+            'status': status,
+            'attempts': attempts,
+            'timings_ms': timings,
+            'llm': (final_state or {}).get('llm_usage') or {},
+            'error': error,
+        }))
+
+    def _grade(self, submission_id, state, enqueued_at):
+        timings = self._queue_timings(state, enqueued_at)
+        if not self._mark_running(submission_id):
+            print(f"Submission {submission_id} no longer needs grading, skipping")
+            return
+
+        try:
+            final_state, attempts = self.run_graph(state, f'submission {submission_id}')
+            self._save_result(submission_id, final_state, attempts, None, timings)
+        except GradingError as e:
+            self._save_result(submission_id, None, e.attempts, str(e), timings)
+
+    async def _agrade(self, submission_id, state, enqueued_at):
+        from services.async_grader import async_grader
+
+        timings = self._queue_timings(state, enqueued_at)
+
+        # Database calls are blocking; run them off the event loop
+        if not await asyncio.to_thread(self._mark_running, submission_id):
+            print(f"Submission {submission_id} no longer needs grading, skipping")
+            return
+
+        try:
+            final_state, attempts = await async_grader.arun_graph(state, f'submission {submission_id}')
+            await asyncio.to_thread(self._save_result, submission_id, final_state, attempts, None, timings)
+        except GradingError as e:
+            await asyncio.to_thread(self._save_result, submission_id, None, e.attempts, str(e), timings)
+
+
+grading_queue = GradingQueue()
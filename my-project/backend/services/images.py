@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageOps
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class ImagePipeline:
+    """Streams uploads to disk and turns stored photos into OCR payloads.
+
+    Uploads are hashed, size-checked and written chunk by chunk instead of
+    being buffered whole. Payloads are decoded at reduced scale, resized to
+    a bounded long edge and base64-encoded once from a single JPEG buffer.
+    """
+
+    def __init__(self):
+        self.max_upload_bytes = 15 * 1024 * 1024
+        self.chunk_size = 64 * 1024
+        self.max_edge = 2048
+        self.jpeg_quality = 85
+        self.max_decode_bytes = 64 * 1024 * 1024
+
+    def init_app(self, app):
+        self.max_upload_bytes = app.config['UPLOAD_MAX_BYTES']
+        self.chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+        self.max_edge = app.config['OCR_IMAGE_MAX_EDGE']
+        self.jpeg_quality = app.config['OCR_JPEG_QUALITY']
+        self.max_decode_bytes = app.config['OCR_MAX_DECODE_BYTES']
+
+    def save_upload(self, file, path):
+        """Writes an uploaded FileStorage to path; returns (sha256 hex, size).
+
+        Raises UploadTooLarge (and leaves nothing on disk) past the size limit.
+        """
+        return self.save_stream(file.stream, path)
+
+    def save_stream(self, stream, path):
+        """Copies a binary stream to path in chunks; see save_upload."""
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = f'{path}.part'
+        try:
+            with open(tmp_path, 'wb') as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise UploadTooLarge(f'Upload exceeds {self.max_upload_bytes} bytes')
+                    digest.update(chunk)
+                    out.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest.hexdigest(), size
+
+    def data_url(self, path):
+        """Returns (data URL, stats) for the image at path, downsampled for OCR."""
+        bytes_in = os.path.getsize(path)
+
+        with Image.open(path) as img:
+            # JPEG can decode straight at 1/2, 1/4 or 1/8 scale, which keeps
+            # a 12MP phone photo from ever materializing at full size
+            img.draft('RGB', (self.max_edge, self.max_edge))
+            decoded_bytes = img.width * img.height * len(img.getbands())
+            if decoded_bytes > self.max_decode_bytes:
+                raise ImageTooLarge(f'Decoded image needs {decoded_bytes} bytes, limit is {self.max_decode_bytes}')
+
+            # Shrink in place first so orientation and mode fixes copy the small image
+            img.thumbnail((self.max_edge, self.max_edge))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=self.jpeg_quality, optimize=True)
+
+        jpeg_bytes = buffer.tell()
+        url = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getbuffer()).decode('ascii')
+        buffer.close()
+
+        stats = {
+            'bytes_in': bytes_in,
+            'decoded_bytes': decoded_bytes,
+            'jpeg_bytes': jpeg_bytes,
+            'payload_bytes': len(url),
+            # Largest set of buffers alive at once: decoded pixels, the JPEG and its base64 text
+            'peak_bytes': decoded_bytes + jpeg_bytes + len(url)
+        }
+        return url, stats
+
+    def file_url(self, path):
+        """Returns (data URL, stats) for a JPEG that is already sized for OCR, sent byte for byte."""
+        with open(path, 'rb') as f:
+            jpeg = f.read()
+        url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+
+        stats = {
+            'bytes_in': len(jpeg),
+            'decoded_bytes': 0,
+            'jpeg_bytes': len(jpeg),
+            'payload_bytes': len(url),
+            'peak_bytes': len(jpeg) + len(url)
+        }
+        return url, stats
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,100 @@
+import bisect
+import threading
+import time
+
+from extensions import db
+from models.user import User
+from services.rating import rating_engine
+
+
+class Leaderboard:
+    """In-process ranking of users by rating_score.
+
+    Keeps a sorted list of (-rating, userid) keys, so rank lookups and page
+    slices are binary searches instead of table scans. Rating changes are
+    applied incrementally once their transaction commits; the whole list is reloaded from the indexed
+    rating_score column only on first use or after LEADERBOARD_REFRESH_SECONDS,
+    which also picks up changes made by other worker processes.
+    """
+
+    def __init__(self):
+        self.refresh_seconds = 60
+        self._lock = threading.RLock()
+        self._keys = []      # sorted (-rating, userid)
+        self._entries = {}   # userid -> (rating, username)
+        self._loaded_at = None
+
+    def init_app(self, app):
+        self.refresh_seconds = app.config['LEADERBOARD_REFRESH_SECONDS']
+        self.invalidate()  # a new app may point at another database
+        if self.update not in rating_engine.listeners:
+            rating_engine.listeners.append(self.update)
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+
+        rows = (db.session.query(User.userid, User.username, User.rating_score)
+                .order_by(User.rating_score.desc(), User.userid)
+                .all())
+        with self._lock:
+            self._entries = {userid: (rating or 0.0, username) for userid, username, rating in rows}
+            self._keys = [(-(rating or 0.0), userid) for userid, _, rating in rows]
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def update(self, userid, rating, username=None):
+        """Moves (or adds) one user; O(log n) search plus a list shift."""
+        with self._lock:
+            if self._loaded_at is None:
+                return  # Nothing cached yet; the next read loads fresh data
+            old = self._entries.get(userid)
+            if old is not None:
+                index = bisect.bisect_left(self._keys, (-old[0], userid))
+                if index < len(self._keys) and self._keys[index] == (-old[0], userid):
+                    del self._keys[index]
+                username = username or old[1]
+            self._entries[userid] = (rating, username)
+            bisect.insort(self._keys, (-rating, userid))
+
+    def remove(self, userid):
+        with self._lock:
+            old = self._entries.pop(userid, None)
+            if old is not None:
+                index = bisect.bisect_left(self._keys, (-old[0], userid))
+                if index < len(self._keys) and self._keys[index] == (-old[0], userid):
+                    del self._keys[index]
+
+    def _rank_of(self, rating):
+        # Competition ranking: 1 + number of users with a strictly higher rating
+        return bisect.bisect_left(self._keys, (-rating,)) + 1
+
+    def page(self, offset, limit):
+        """Returns (total, entries) for ranks offset+1 .. offset+limit."""
+        self._ensure_loaded()
+        with self._lock:
+            entries = []
+            for _, userid in self._keys[offset:offset + limit]:
+                rating, username = self._entries[userid]
+                entries.append({
+                    'rank': self._rank_of(rating),
+                    'userid': userid,
+                    'username': username,
+                    'rating_score': rating
+                })
+            return len(self._keys), entries
+
+    def rank(self, userid):
+        """Returns (rank, rating, total), or None for an unknown user."""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(userid)
+            if entry is None:
+                return None
+            return self._rank_of(entry[0]), entry[0], len(self._keys)
+
+
+leaderboard = Leaderboard()
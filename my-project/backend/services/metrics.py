@@ -0,0 +1,146 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; wide enough for both a file save and a slow model call
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+HELP = {
+    'grading_stage_seconds': 'Time spent in each stage of handling a submission.',
+    'llm_calls_total': 'Model calls by pipeline role.',
+    'llm_tokens_total': 'Model tokens by pipeline role and direction.',
+    'llm_bytes_total': 'Model request and response payload bytes by pipeline role.',
+    'submissions_graded_total': 'Finished gradings by outcome.',
+    'answer_checks_total': 'Local final-answer checks by outcome (match, mismatch, unparsed).',
+    'answer_check_short_circuit_ratio': 'Share of checked submissions graded without the compare model.',
+}
+
+
+def label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """In-process counters and latency histograms, rendered in Prometheus text format.
+
+    Every process keeps its own numbers, like the caches do; scrape each
+    worker, or aggregate with sum() / histogram_quantile() in Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [per-bucket counts, sum, count]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def span(self, stage, timings=None):
+        """Times a block as grading_stage_seconds{stage=...}; also records ms into timings."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe('grading_stage_seconds', elapsed, stage=stage)
+            if timings is not None:
+                timings[stage] = round(elapsed * 1000, 1)
+
+    def timed_node(self, stage):
+        """Decorator for graph nodes: times the node and adds {'timings': {stage: ms}} to its update."""
+        def decorator(node):
+            def finish(started, update):
+                elapsed = time.perf_counter() - started
+                self.observe('grading_stage_seconds', elapsed, stage=stage)
+                return {**(update or {}), 'timings': {stage: round(elapsed * 1000, 1)}}
+
+            if inspect.iscoroutinefunction(node):
+                @functools.wraps(node)
+                async def async_wrapper(state):
+                    started = time.perf_counter()
+                    return finish(started, await node(state))
+                return async_wrapper
+
+            @functools.wraps(node)
+            def wrapper(state):
+                started = time.perf_counter()
+                return finish(started, node(state))
+            return wrapper
+        return decorator
+
+    def llm_call(self, role, request_bytes, result):
+        """Counts one model call; returns its usage as a dict for the graph state."""
+        usage = getattr(result, 'usage_metadata', None) or {}
+        content = result.content if isinstance(result.content, str) else str(result.content)
+        record = {
+            'input_tokens': usage.get('input_tokens', 0),
+            'output_tokens': usage.get('output_tokens', 0),
+            'request_bytes': request_bytes,
+            'response_bytes': len(content.encode('utf-8')),
+        }
+        self.inc('llm_calls_total', role=role)
+        self.inc('llm_tokens_total', record['input_tokens'], role=role, direction='input')
+        self.inc('llm_tokens_total', record['output_tokens'], role=role, direction='output')
+        self.inc('llm_bytes_total', record['request_bytes'], role=role, direction='request')
+        self.inc('llm_bytes_total', record['response_bytes'], role=role, direction='response')
+        return record
+
+    def render(self, gauges=()):
+        """Prometheus exposition text; gauges is an iterable of (name, labels dict, value)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, ([*h[0]], h[1], h[2])) for key, h in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f'# HELP {name} {HELP[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f'{name}{label_text(labels)} {value}')
+
+        for (name, labels), (buckets, total, count) in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{label_text(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_bucket{label_text(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{label_text(labels)} {total}')
+            lines.append(f'{name}_count{label_text(labels)} {count}')
+
+        # A metric's samples must be contiguous in the output
+        for name, labels, value in sorted(gauges, key=lambda gauge: gauge[0]):
+            describe(name, 'gauge')
+            lines.append(f'{name}{label_text(tuple(sorted(labels.items())))} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
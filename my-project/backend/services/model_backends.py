@@ -0,0 +1,74 @@
+import threading
+
+# name -> factory(role, model_name, config) returning a LangChain chat model.
+# Factories import their client libraries themselves, so LangChain is only
+# loaded once a model is actually needed.
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Decorator that makes a chat model factory selectable by name in config."""
+    def decorator(factory):
+        BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+@register_backend('gemini')
+def gemini_backend(role, model_name, config):
+    # Imported lazily so the fake backend works without the Google SDK installed
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model_name)
+
+
+@register_backend('fake')
+def fake_backend(role, model_name, config):
+    from services.fake_model import FakeChatModel
+    return FakeChatModel(response=config[f'FAKE_{role.upper()}_RESPONSE'], latency=config['FAKE_MODEL_LATENCY'])
+
+
+class ModelRegistry:
+    """Builds and caches one chat model per pipeline role ('ocr', 'compare').
+
+    Each role names its backend and model in config, e.g. OCR_MODEL_BACKEND
+    and OCR_MODEL_NAME; the fake backend replies with FAKE_<ROLE>_RESPONSE.
+    Clients are built on first use, not at import time.
+    """
+
+    def __init__(self):
+        self.config = {
+            'OCR_MODEL_BACKEND': 'gemini',
+            'OCR_MODEL_NAME': 'gemini-2.5-pro-exp-03-25',
+            'COMPARE_MODEL_BACKEND': 'gemini',
+            'COMPARE_MODEL_NAME': 'gemini-2.5-pro-exp-03-25',
+            'FAKE_MODEL_LATENCY': 0.0,
+            'FAKE_OCR_RESPONSE': '',
+            'FAKE_COMPARE_RESPONSE': '',
+        }
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        for key in self.config:
+            self.config[key] = app.config[key]
+        with self._lock:
+            self._models.clear()
+
+    def get(self, role):
+        model = self._models.get(role)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if role not in self._models:
+                prefix = role.upper()
+                backend = self.config[f'{prefix}_MODEL_BACKEND']
+                if backend not in BACKENDS:
+                    raise ValueError(f"Unknown model backend '{backend}' for {role}; "
+                                     f"choose from {sorted(BACKENDS)}")
+                self._models[role] = BACKENDS[backend](role, self.config[f'{prefix}_MODEL_NAME'], self.config)
+                print(f"Using {backend} backend for {role}")
+            return self._models[role]
+
+
+model_registry = ModelRegistry()
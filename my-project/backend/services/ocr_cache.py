@@ -0,0 +1,113 @@
+import fcntl
+import os
+import threading
+
+
+class OcrCache:
+    """Disk-backed LRU cache of OCR transcriptions keyed by image SHA-256.
+
+    Each entry is a small text file named after the hash, and the directory
+    is the only index, so every worker process sharing OCR_CACHE_DIR sees
+    the same entries. A hit refreshes the file's mtime; eviction is a sweep
+    of the directory that deletes the oldest files, run under a file lock
+    so only one process sweeps at a time.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.max_entries = 0
+        self.sweep_every = 1
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts = 0  # puts by this process since its last sweep
+
+    def init_app(self, app):
+        self.directory = app.config['OCR_CACHE_DIR']
+        self.max_entries = app.config['OCR_CACHE_MAX_ENTRIES']
+        # The directory may run this far over max_entries per process between sweeps
+        self.sweep_every = max(1, self.max_entries // 100)
+        os.makedirs(self.directory, exist_ok=True)
+        self._sweep()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.txt')
+
+    def get(self, key):
+        """Returns the cached transcription for key, or None on a miss."""
+        if not key or self.directory is None:
+            return None
+
+        try:
+            path = self._path(key)
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            # Never cached, or evicted by any process sharing the directory
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        if not key or self.directory is None:
+            return
+
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._puts += 1
+            if self._puts < self.sweep_every:
+                return
+            self._puts = 0
+        self._sweep()
+
+    def _entries(self):
+        """(mtime, path) of every entry on disk, oldest first."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.txt'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        entries.sort()
+        return entries
+
+    def _sweep(self):
+        with open(os.path.join(self.directory, '.sweep.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another process is sweeping the same directory right now
+                return
+            entries = self._entries()
+            for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        entries = len(self._entries()) if self.directory else 0
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+ocr_cache = OcrCache()
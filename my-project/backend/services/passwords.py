@@ -0,0 +1,113 @@
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from extensions import db
+from models.user import User
+
+# Stored values without one of these prefixes are legacy plain-text passwords
+HASH_PREFIXES = ('pbkdf2:', 'scrypt:', 'bcrypt:')
+
+
+def split_method(prefix):
+    """('pbkdf2:sha256', (1000000,)) for 'pbkdf2:sha256:1000000'; cost parameters are the numeric parts."""
+    parts = prefix.split(':')
+    names = [part for part in parts if not part.isdigit()]
+    cost = tuple(int(part) for part in parts if part.isdigit())
+    return ':'.join(names), cost
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(HASH_PREFIXES)
+
+
+class PasswordHasher:
+    """Runs password hashing and verification on a small bounded worker pool.
+
+    The request thread still waits for its hash; the pool only caps how many
+    key derivations run at once, so PASSWORD_HASH_WORKERS bounds how many
+    cores a login spike can take. hashlib's pbkdf2 and scrypt release the GIL,
+    so a thread pool is enough for that and no process pool is needed.
+    PASSWORD_HASH_METHOD is a werkzeug method string; hashes made with another
+    algorithm, or with a lower cost than it, are upgraded on next login.
+    Hashes that cost more than the method are left alone.
+    """
+
+    def __init__(self):
+        self.method = 'pbkdf2:sha256'
+        self.app = None
+        self._pool = None
+        self._prefix = None
+        self._pending = set()  # userids with a rehash already queued
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self._prefix = None
+        self._pool = ThreadPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                                        thread_name_prefix='password-hash')
+
+    def hash(self, password):
+        return self._pool.submit(generate_password_hash, password, method=self.method).result()
+
+    def verify(self, stored, password):
+        """Checks a password against a stored hash, or against a legacy plain-text value."""
+        if not is_hashed(stored):
+            return hmac.compare_digest(stored.encode(), password.encode())
+        try:
+            return self._pool.submit(check_password_hash, stored, password).result()
+        except ValueError as e:
+            # Unsupported method in the stored value (e.g. bcrypt)
+            print(f"Error during password verification: {str(e)}")
+            return False
+
+    def needs_rehash(self, stored):
+        """Runs a full hash the first time it is called; call it from the pool, not a request."""
+        if not is_hashed(stored):
+            return True
+        if self._prefix is None:
+            # The method with defaults filled in, e.g. 'pbkdf2:sha256:1000000'
+            self._prefix = split_method(generate_password_hash('', method=self.method).split('$', 1)[0])
+        algorithm, cost = split_method(stored.split('$', 1)[0])
+        current_algorithm, current_cost = self._prefix
+        if algorithm != current_algorithm or len(cost) != len(current_cost):
+            return True
+        # Only ever upgrade: a parameter below the configured one is stale, one above is kept
+        return any(old < new for old, new in zip(cost, current_cost))
+
+    def rehash_later(self, userid, password, stored):
+        """Queues an upgrade of a verified password if it is not on the current method.
+
+        The check runs on the pool as well, so login never pays for it. The
+        update only applies if the stored value is unchanged, so it can never
+        overwrite a password reset that lands in the meantime.
+        """
+        with self._lock:
+            if userid in self._pending:
+                return
+            self._pending.add(userid)
+        self._pool.submit(self._rehash, userid, password, stored)
+
+    def _rehash(self, userid, password, stored):
+        try:
+            if not self.needs_rehash(stored):
+                return
+            new_hash = generate_password_hash(password, method=self.method)
+            with self.app.app_context():
+                updated = (db.session.query(User)
+                           .filter_by(userid=userid, password=stored)
+                           .update({'password': new_hash}, synchronize_session=False))
+                db.session.commit()
+            if updated:
+                print(f"Upgraded password hash for user {userid}")
+        except Exception as e:
+            print(f"Password rehash failed for user {userid}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(userid)
+
+
+password_hasher = PasswordHasher()
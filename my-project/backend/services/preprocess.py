@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, ImageStat
+
+from services.images import ImageTooLarge
+
+
+def _line_score(gray, angle):
+    """Variance of row darkness after rotating; peaks when text lines are level."""
+    rotated = gray.rotate(angle, resample=Image.BILINEAR, fillcolor=255)
+    rows = rotated.resize((1, rotated.height), Image.BOX)
+    return ImageStat.Stat(rows).var[0]
+
+
+def _skew_angle(gray, max_angle, step):
+    sample = gray.copy()
+    sample.thumbnail((400, 400))
+    angles = [i * step for i in range(-int(max_angle / step), int(max_angle / step) + 1)]
+    return max(angles, key=lambda angle: (_line_score(sample, angle), -abs(angle)))
+
+
+def preprocess_image(src_path, dst_path, max_edge=2048, jpeg_quality=80,
+                     max_skew=5.0, skew_step=0.5, ink_threshold=160, margin=0.02,
+                     max_decode_bytes=64 * 1024 * 1024):
+    """Cleans up a handwriting photo for OCR and writes it to dst_path as JPEG.
+
+    Auto-orients, converts to grayscale, deskews, crops to the inked area and
+    resizes to max_edge. Returns per-stage timings (ms) and byte counts.
+    Raises ImageTooLarge before decoding an image bigger than max_decode_bytes.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    def lap(stage):
+        nonlocal start
+        now = time.perf_counter()
+        timings[stage] = round((now - start) * 1000, 2)
+        start = now
+
+    with Image.open(src_path) as img:
+        # Decode at reduced scale when the format allows it, leaving room for the crop
+        img.draft('L', (max_edge * 2, max_edge * 2))
+        # Only JPEG has a reduced-scale decode; anything else would load in full
+        decoded_bytes = img.width * img.height * len(img.getbands())
+        if decoded_bytes > max_decode_bytes:
+            raise ImageTooLarge(f'Decoded image needs {decoded_bytes} bytes, limit is {max_decode_bytes}')
+        img = ImageOps.exif_transpose(img)
+        lap('orient')
+
+        gray = img.convert('L')
+        lap('grayscale')
+
+    angle = _skew_angle(gray, max_skew, skew_step)
+    if angle:
+        gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    lap('deskew')
+
+    ink = ImageOps.autocontrast(gray).point(lambda p: 255 if p < ink_threshold else 0)
+    bbox = ink.getbbox()
+    if bbox:
+        pad_x = int(gray.width * margin)
+        pad_y = int(gray.height * margin)
+        gray = gray.crop((
+            max(bbox[0] - pad_x, 0),
+            max(bbox[1] - pad_y, 0),
+            min(bbox[2] + pad_x, gray.width),
+            min(bbox[3] + pad_y, gray.height)
+        ))
+    lap('crop')
+
+    gray.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    lap('resize')
+
+    # Write then rename: the same stored image may be preprocessed by two gradings at once
+    tmp_path = f'{dst_path}.{os.getpid()}.{threading.get_ident()}.part'
+    gray.save(tmp_path, format='JPEG', quality=jpeg_quality, optimize=True)
+    os.replace(tmp_path, dst_path)
+    lap('encode')
+
+    return {
+        'bytes_in': os.path.getsize(src_path),
+        'bytes_out': os.path.getsize(dst_path),
+        'skew_degrees': angle,
+        'size_out': [gray.width, gray.height],
+        'timings_ms': timings,
+        'total_ms': round(sum(timings.values()), 2)
+    }
+
+
+class Preprocessor:
+    """Runs preprocess_image on a bounded pool of worker threads.
+
+    Pillow releases the GIL inside decode, rotate, resize and encode, so a
+    small thread pool keeps this CPU work off the request threads and caps
+    how many photos are being crunched at once.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.options = {}
+        self._pool = None
+
+    def init_app(self, app):
+        self.enabled = app.config['PREPROCESS_ENABLED']
+        self._pool = ThreadPoolExecutor(max_workers=app.config['PREPROCESS_WORKERS'],
+                                        thread_name_prefix='preprocess')
+        self.options = {
+            'max_edge': app.config['OCR_IMAGE_MAX_EDGE'],
+            'jpeg_quality': app.config['OCR_JPEG_QUALITY'],
+            'max_skew': app.config['PREPROCESS_MAX_SKEW'],
+            'max_decode_bytes': app.config['OCR_MAX_DECODE_BYTES'],
+        }
+
+    def submit(self, src_path):
+        """Queues src_path for preprocessing; returns (path to feed OCR, future of stats)."""
+        root, _ = os.path.splitext(src_path)
+        dst_path = f'{root}.ocr.jpg'
+        return dst_path, self._pool.submit(preprocess_image, src_path, dst_path, **self.options)
+
+
+preprocessor = Preprocessor()
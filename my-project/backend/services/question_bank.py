@@ -0,0 +1,78 @@
+import json
+import os
+import random
+import threading
+
+
+class QuestionBank:
+    """In-memory copy of questions.json with lookups by question ID and level.
+
+    The file is parsed once and re-read only when its mtime changes, so
+    request handlers never pay for a full json.load.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._questions = []
+        self._by_id = {}
+        self._by_level = {}
+
+    def init_app(self, app):
+        self.path = app.config['QUESTIONS_FILE']
+        try:
+            self._reload_if_changed()
+            print(f"Loaded {len(self._questions)} questions from {os.path.abspath(self.path)}")
+        except Exception as e:
+            print(f"Error loading question bank: {str(e)}")
+
+    def _reload_if_changed(self):
+        mtime = os.stat(self.path).st_mtime
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+
+            by_id = {}
+            by_level = {}
+            for question in data:
+                by_id[str(question.get('Question ID'))] = question
+                by_level.setdefault(question.get('Level'), []).append(question)
+
+            # Swap in the new indexes together so readers never see a mix
+            self._questions, self._by_id, self._by_level = data, by_id, by_level
+            self._mtime = mtime
+
+    def get(self, question_id):
+        """Returns the question dict for question_id, or None."""
+        self._reload_if_changed()
+        return self._by_id.get(str(question_id))
+
+    def get_solution(self, question_id):
+        question = self.get(question_id)
+        return question.get('Solution') if question else None
+
+    def snapshot(self):
+        """Returns (version, questions) so derived indexes can tell when the bank changed."""
+        self._reload_if_changed()
+        with self._lock:
+            return self._mtime, self._questions
+
+    def by_level(self, level):
+        """Returns all questions for a numeric level (e.g. 2 -> 'Level 2')."""
+        self._reload_if_changed()
+        return self._by_level.get(f'Level {level}', [])
+
+    def sample_level(self, level, k=3):
+        """Picks up to k random questions of the given level."""
+        questions = self.by_level(level)
+        return random.sample(questions, min(k, len(questions)))
+
+
+question_bank = QuestionBank()
@@ -0,0 +1,180 @@
+import json
+import re
+from datetime import datetime
+
+from sqlalchemy import delete, event, insert, update
+
+from extensions import db
+from models.problem import Problem, Submission
+from models.rating_history import RatingHistory, RatingSummary
+from models.user import User
+from services.question_bank import question_bank
+from services.verdict import verdict_score
+
+
+class RatingEngine:
+    """Elo-style rating updated once per graded submission.
+
+    Each problem is treated as an opponent whose rating grows with its
+    difficulty; the verdict's 0..1 credit is the game result. Updates are
+    incremental: the new rating depends only on the stored rating_score.
+    """
+
+    def __init__(self):
+        self.k_factor = 32.0
+        self.initial = 0.0
+        self.problem_base = 0.0
+        self.difficulty_step = 100.0
+        self.default_difficulty = 3
+        self.listeners = []  # callables(userid, rating) run after each committed change
+        self._hooked = False
+
+    def init_app(self, app):
+        self.k_factor = app.config['RATING_K_FACTOR']
+        self.initial = app.config['RATING_INITIAL']
+        self.problem_base = app.config['RATING_PROBLEM_BASE']
+        self.difficulty_step = app.config['RATING_DIFFICULTY_STEP']
+        self.default_difficulty = app.config['RATING_DEFAULT_DIFFICULTY']
+        if not self._hooked:
+            # Listeners hear about a rating only once its transaction commits
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_soft_rollback', self._after_rollback)
+            self._hooked = True
+
+    def difficulty_for(self, problem_id):
+        """Difficulty 1-5 for a submission's problem ID ('question-12' or '12')."""
+        question = question_bank.get(problem_id)
+        if question:
+            level = re.search(r'\d+', str(question.get('Level', '')))
+            if level:
+                return int(level.group())
+
+        number = re.search(r'\d+$', str(problem_id))
+        if number:
+            problem = db.session.get(Problem, int(number.group()))
+            if problem:
+                return problem.difficulty
+        return self.default_difficulty
+
+    def next_rating(self, rating, difficulty, score):
+        opponent = self.problem_base + (difficulty - 1) * self.difficulty_step
+        expected = 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+        return rating + self.k_factor * (score - expected)
+
+    def rate_submission(self, submission, final_output):
+        """Updates the submitter's rating in the current transaction.
+
+        Appends a RatingHistory row, folds the point into the user's
+        RatingSummary and returns the new rating, or None when
+        the submission has no user or no parseable verdict. The caller commits;
+        listeners (the leaderboard) are told only once that commit succeeds.
+        """
+        score = verdict_score(final_output)
+        if submission.user_id is None or score is None:
+            return None
+
+        # Lock the user row so concurrent gradings for one user do not lose updates
+        user = db.session.query(User).filter_by(userid=submission.user_id).with_for_update().first()
+        if user is None:
+            return None
+
+        difficulty = self.difficulty_for(submission.problem_id)
+        date = submission.submitted_at or datetime.utcnow()
+        user.rating_score = round(self.next_rating(user.rating_score or 0.0, difficulty, score), 2)
+        db.session.add(RatingHistory(user_id=user.userid, rating=user.rating_score, date=date))
+
+        summary = db.session.get(RatingSummary, user.userid)
+        if summary is None:
+            summary = RatingSummary(user_id=user.userid)
+            db.session.add(summary)
+        summary.add_point(date, user.rating_score)
+        db.session.info.setdefault('rating_changes', {})[user.userid] = user.rating_score
+        return user.rating_score
+
+    def _notify(self, userid, rating):
+        for listener in self.listeners:
+            listener(userid, rating)
+
+    def _after_commit(self, session):
+        if session.in_nested_transaction():
+            return  # a savepoint was released; the outer transaction can still roll back
+        for userid, rating in session.info.pop('rating_changes', {}).items():
+            self._notify(userid, rating)
+
+    def _after_rollback(self, session, previous_transaction):
+        # A savepoint rollback (e.g. a lost stats insert race) keeps the outer transaction's changes
+        if not previous_transaction.nested:
+            session.info.pop('rating_changes', None)
+
+    def replay(self, batch_size=1000):
+        """Rebuilds every rating and the whole rating history from submissions.
+
+        Makes one pass over graded submissions in submission order, keeping
+        only the current rating per user in memory, and writes history in batches.
+        """
+        ratings = {}
+        summaries = {}
+        difficulties = {}
+        history = []
+        replayed = 0
+
+        db.session.execute(delete(RatingHistory))
+        db.session.execute(delete(RatingSummary))
+        known = {userid for (userid,) in db.session.query(User.userid)}
+
+        # Keyset batches by submission_id (i.e. submission order) so history
+        # inserts never interleave with an open streaming cursor
+        last_id = 0
+        while True:
+            batch = (db.session.query(Submission.submission_id, Submission.user_id, Submission.problem_id,
+                                      Submission.model_output, Submission.submitted_at)
+                     .filter(Submission.submission_id > last_id,
+                             Submission.status == 'done',
+                             Submission.user_id.isnot(None))
+                     .order_by(Submission.submission_id)
+                     .limit(batch_size)
+                     .all())
+            if not batch:
+                break
+            last_id = batch[-1].submission_id
+
+            for _, user_id, problem_id, model_output, submitted_at in batch:
+                if user_id not in known:
+                    continue
+                try:
+                    final_output = json.loads(model_output or '{}').get('final_output')
+                except ValueError:
+                    continue
+                score = verdict_score(final_output)
+                if score is None:
+                    continue
+
+                if problem_id not in difficulties:
+                    difficulties[problem_id] = self.difficulty_for(problem_id)
+                rating = round(self.next_rating(ratings.get(user_id, self.initial), difficulties[problem_id], score), 2)
+                date = submitted_at or datetime.utcnow()
+                ratings[user_id] = rating
+                history.append({'user_id': user_id, 'rating': rating, 'date': date})
+                if user_id not in summaries:
+                    summaries[user_id] = RatingSummary(user_id=user_id)
+                summaries[user_id].add_point(date, rating)
+                replayed += 1
+
+            if history:
+                db.session.execute(insert(RatingHistory), history)
+                history = []
+
+        # Users without graded submissions go back to the starting rating
+        db.session.execute(update(User).values(rating_score=self.initial))
+        rows = [{'userid': u, 'rating_score': r} for u, r in ratings.items()]
+        if rows:
+            db.session.execute(update(User), rows)
+        db.session.add_all(summaries.values())
+        db.session.commit()
+
+        for row in rows:
+            self._notify(row['userid'], row['rating_score'])
+        return {'submissions': replayed, 'users': len(rows)}
+
+
+rating_engine = RatingEngine()
@@ -0,0 +1,191 @@
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from extensions import db
+from models.problem import Submission
+from services.leaderboard import leaderboard
+from services.question_bank import question_bank
+from services.rating import rating_engine
+
+
+class Pools:
+    """Question-bank indexes for one version of questions.json.
+
+    Every question gets a dense number (its position in the bank), which
+    is what the per-user bitmaps are indexed by. Pools hold those numbers
+    per level and per (level, topic), each shuffled once so a scan from a
+    random offset yields a random-looking sample.
+    """
+
+    def __init__(self, version, questions, rng):
+        self.version = version
+        self.questions = questions
+        self.index_of = {}
+        self.by_level = {}
+        self.by_topic = {}
+        for i, question in enumerate(questions):
+            self.index_of[str(question.get('Question ID'))] = i
+            level = re.search(r'\d+', str(question.get('Level', '')))
+            if level is None:
+                continue
+            level = int(level.group())
+            self.by_level.setdefault(level, []).append(i)
+            self.by_topic.setdefault((level, str(question.get('Topic', '')).lower()), []).append(i)
+        for pool in (*self.by_level.values(), *self.by_topic.values()):
+            rng.shuffle(pool)
+        self.levels = sorted(self.by_level)
+
+
+class UserHistory:
+    """Bitmap of the questions one user has attempted, one bit per question number."""
+
+    __slots__ = ('version', 'bits', 'loaded_at')
+
+    def __init__(self, version, size):
+        self.version = version
+        self.bits = bytearray((size + 7) // 8)
+        self.loaded_at = time.monotonic()
+
+    def add(self, i):
+        self.bits[i >> 3] |= 1 << (i & 7)
+
+    def __contains__(self, i):
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+
+class QuestionRecommender:
+    """Picks questions near a user's rating that they have not attempted yet.
+
+    The target level is the one whose problem rating (as the rating engine
+    sees it) is closest to the user's rating; neighbouring levels fill in
+    when it runs dry, and only then are attempted questions repeated. Pools
+    are rebuilt when the question bank changes; a user's bitmap is loaded
+    once from their submissions, kept current as they submit, and reloaded
+    after RECOMMEND_USER_TTL_SECONDS to pick up other workers' submissions.
+    """
+
+    def __init__(self):
+        self.user_ttl = 300
+        self.max_users = 10000
+        self.pool_refresh = 30
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._pools = None
+        self._checked_at = None
+        self._users = OrderedDict()  # userid -> UserHistory, least recently used first
+
+    def init_app(self, app):
+        self.user_ttl = app.config['RECOMMEND_USER_TTL_SECONDS']
+        self.max_users = app.config['RECOMMEND_MAX_USERS']
+        self.pool_refresh = app.config['RECOMMEND_POOL_REFRESH_SECONDS']
+        with self._lock:
+            # A new app may point at another question bank and database
+            self._pools = None
+            self._users.clear()
+
+    def pools(self):
+        # questions.json is stat()ed at most every pool_refresh seconds, not per request
+        now = time.monotonic()
+        if self._pools is not None and now - self._checked_at < self.pool_refresh:
+            return self._pools
+        version, questions = question_bank.snapshot()
+        with self._lock:
+            if self._pools is None or self._pools.version != version:
+                self._pools = Pools(version, questions, self._rng)
+                self._users.clear()  # question numbers changed, so every bitmap is stale
+            self._checked_at = now
+            return self._pools
+
+    def target_level(self, userid, pools):
+        ranked = leaderboard.rank(userid) if userid is not None else None
+        if ranked is None or not pools.levels:
+            return None
+        rating = ranked[1]
+        level = round((rating - rating_engine.problem_base) / rating_engine.difficulty_step) + 1
+        return min(max(level, pools.levels[0]), pools.levels[-1])
+
+    def history(self, userid, pools):
+        with self._lock:
+            history = self._users.get(userid)
+            if history is not None and history.version == pools.version \
+                    and time.monotonic() - history.loaded_at < self.user_ttl:
+                self._users.move_to_end(userid)
+                return history
+
+        # One index range read per user per TTL, never per request
+        history = UserHistory(pools.version, len(pools.questions))
+        rows = db.session.query(Submission.problem_id).filter(Submission.user_id == userid).distinct()
+        for (problem_id,) in rows:
+            i = pools.index_of.get(problem_id)
+            if i is not None:
+                history.add(i)
+        with self._lock:
+            self._users[userid] = history
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return history
+
+    def mark_attempted(self, userid, problem_id):
+        """Records a new submission in the user's bitmap, if it is loaded."""
+        pools = self._pools
+        if pools is None or userid is None:
+            return
+        try:
+            userid = int(userid)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            history = self._users.get(userid)
+            i = pools.index_of.get(problem_id)
+            if history is not None and i is not None and history.version == pools.version:
+                history.add(i)
+
+    def recommend(self, userid=None, count=3, level=None, topic=None):
+        """Returns up to count question dicts; an explicit level is never widened to its neighbours."""
+        pools = self.pools()
+        explicit = level is not None
+        if not explicit:
+            level = self.target_level(userid, pools) or 3
+        history = self.history(userid, pools) if userid is not None else None
+
+        def pool_for(candidate):
+            if topic:
+                return pools.by_topic.get((candidate, topic.lower()), [])
+            return pools.by_level.get(candidate, [])
+
+        # An explicit level is kept; an inferred one widens outwards: level+1, level-1, level+2, ...
+        order = [level]
+        if not explicit:
+            order += [l for d in range(1, len(pools.levels) + 1) for l in (level + d, level - d)
+                      if l in pools.by_level]
+        picked = []
+        for allow_repeats in (False, True):
+            for candidate in order:
+                pool = pool_for(candidate)
+                if not pool:
+                    continue
+                start = self._rng.randrange(len(pool))
+                for offset in range(len(pool)):
+                    i = pool[(start + offset) % len(pool)]
+                    if i in picked or (not allow_repeats and history is not None and i in history):
+                        continue
+                    picked.append(i)
+                    if len(picked) == count:
+                        return [pools.questions[i] for i in picked]
+            if history is None:
+                break
+        return [pools.questions[i] for i in picked]
+
+    def stats(self):
+        pools = self._pools
+        return {
+            'questions': len(pools.questions) if pools else 0,
+            'levels': {level: len(pool) for level, pool in pools.by_level.items()} if pools else {},
+            'users_cached': len(self._users),
+        }
+
+
+question_recommender = QuestionRecommender()
@@ -0,0 +1,137 @@
+from sqlalchemy import case, delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.problem import Problem, Submission
+from models.stats import ProblemStats, UserStats
+from models.user import User
+from services.question_bank import question_bank
+from services.rating import rating_engine
+
+COUNTERS = ('attempts', 'correct', 'partial', 'incorrect', 'score_total', 'latency_total_ms', 'latency_count')
+
+
+def increments_for(submission):
+    """Counter deltas for one graded submission, from its typed result columns."""
+    score = submission.score
+    latency = submission.latency_ms
+    return {
+        'attempts': 1,
+        'correct': 1 if submission.is_correct else 0,
+        'partial': 1 if score is not None and 0 < score < 1 else 0,
+        'incorrect': 1 if score == 0 else 0,
+        'score_total': score or 0.0,
+        'latency_total_ms': latency or 0,
+        'latency_count': 1 if latency is not None else 0,
+    }
+
+
+class SubmissionStats:
+    """Attempt, solve-rate and latency summaries per problem and per user.
+
+    record() adds one graded submission to its problem's row and to the
+    user's topic and difficulty rows with `counter = counter + n` updates,
+    so concurrent gradings never overwrite each other. Reads are primary-key
+    lookups and never aggregate over submissions.
+    """
+
+    def facets(self, problem_id):
+        """(topic, difficulty) of a submission's problem, for the per-user rows."""
+        question = question_bank.get(problem_id)
+        topic = question.get('Topic') if question else None
+        if topic is None:
+            number = str(problem_id).rsplit('-', 1)[-1]
+            problem = db.session.get(Problem, int(number)) if number.isdigit() else None
+            topic = problem.topic if problem else 'unknown'
+        return str(topic).lower(), str(rating_engine.difficulty_for(problem_id))
+
+    def record(self, submission):
+        """Counts a graded submission in the current transaction; the caller commits."""
+        increments = increments_for(submission)
+        self._bump(ProblemStats, {'problem_id': submission.problem_id}, increments)
+        if submission.user_id is not None:
+            topic, difficulty = self.facets(submission.problem_id)
+            self._bump(UserStats, {'user_id': submission.user_id, 'dimension': 'topic', 'value': topic}, increments)
+            self._bump(UserStats, {'user_id': submission.user_id, 'dimension': 'difficulty', 'value': difficulty},
+                       increments)
+
+    def _bump(self, model, keys, increments):
+        statement = (update(model)
+                     .where(*[getattr(model, column) == value for column, value in keys.items()])
+                     .values({getattr(model, column): getattr(model, column) + amount
+                              for column, amount in increments.items()})
+                     .execution_options(synchronize_session=False))
+        if db.session.execute(statement).rowcount:
+            return
+        try:
+            # First submission for this row; a savepoint keeps a lost insert race from failing the grading
+            with db.session.begin_nested():
+                db.session.execute(insert(model).values(**keys, **increments))
+        except IntegrityError:
+            db.session.execute(statement)
+
+    def problem(self, problem_id):
+        return db.session.get(ProblemStats, problem_id)
+
+    def user(self, user_id, session=None):
+        """{'topic': {...}, 'difficulty': {...}} for a user, from their rows only."""
+        rows = (session or db.session).query(UserStats).filter(UserStats.user_id == user_id).all()
+        result = {'topic': {}, 'difficulty': {}}
+        for row in rows:
+            result.setdefault(row.dimension, {})[row.value] = row.to_dict()
+        return result
+
+    def rebuild(self, batch_size=1000):
+        """Recomputes both tables from graded submissions in one transaction.
+
+        Submissions are aggregated per (user, problem) in the database; only
+        those partial sums are folded into topic and difficulty rows here.
+        """
+        score = Submission.score
+        partial = case(((score > 0) & (score < 1), 1), else_=0)
+        aggregates = (db.session.query(
+                          Submission.user_id, Submission.problem_id,
+                          func.count().label('attempts'),
+                          func.sum(case((Submission.is_correct.is_(True), 1), else_=0)).label('correct'),
+                          func.sum(partial).label('partial'),
+                          func.sum(case((score == 0, 1), else_=0)).label('incorrect'),
+                          func.coalesce(func.sum(score), 0.0).label('score_total'),
+                          func.coalesce(func.sum(Submission.latency_ms), 0).label('latency_total_ms'),
+                          func.count(Submission.latency_ms).label('latency_count'))
+                      .filter(Submission.status == 'done')
+                      .group_by(Submission.user_id, Submission.problem_id))
+
+        problems = {}
+        users = {}
+        facets = {}
+        for row in aggregates.yield_per(batch_size):
+            counts = {column: getattr(row, column) or 0 for column in COUNTERS}
+            self._add(problems, (row.problem_id,), counts)
+            if row.user_id is not None:
+                if row.problem_id not in facets:
+                    facets[row.problem_id] = self.facets(row.problem_id)
+                topic, difficulty = facets[row.problem_id]
+                self._add(users, (row.user_id, 'topic', topic), counts)
+                self._add(users, (row.user_id, 'difficulty', difficulty), counts)
+
+        db.session.execute(delete(ProblemStats))
+        db.session.execute(delete(UserStats))
+        # Submissions can outlive their user; user_stats rows reference users
+        known = {userid for (userid,) in db.session.query(User.userid)}
+        problem_rows = [{'problem_id': key[0], **counts} for key, counts in problems.items()]
+        user_rows = [{'user_id': key[0], 'dimension': key[1], 'value': key[2], **counts}
+                     for key, counts in users.items() if key[0] in known]
+        for rows, model in ((problem_rows, ProblemStats), (user_rows, UserStats)):
+            for start in range(0, len(rows), batch_size):
+                db.session.execute(insert(model), rows[start:start + batch_size])
+        db.session.commit()
+        return {'problems': len(problem_rows), 'user_rows': len(user_rows)}
+
+    @staticmethod
+    def _add(totals, key, counts):
+        row = totals.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        for column, value in counts.items():
+            row[column] += value
+
+
+submission_stats = SubmissionStats()
@@ -0,0 +1,269 @@
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+from werkzeug.utils import secure_filename
+
+from extensions import db
+from services.images import image_pipeline
+
+# name -> class(config) implementing the storage backend interface below
+STORAGE_BACKENDS = {}
+
+# '<sha[:2]>/<sha[2:4]>/<sha><suffix>', where suffix is the extension or a
+# derivative marker such as '.thumb.jpg' or '.ocr.jpg'
+KEY_PATTERN = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9.]+)$')
+# Hashes inside a JSON list of keys (Submission.image_paths)
+KEY_HASH = re.compile(r'[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})')
+
+EXTENSIONS = {'.jpg': '.jpg', '.jpeg': '.jpg', '.png': '.png', '.webp': '.webp',
+              '.gif': '.gif', '.bmp': '.bmp', '.heic': '.heic', '.tif': '.tif', '.tiff': '.tif'}
+
+
+def register_storage(name):
+    """Decorator that makes a storage backend selectable by STORAGE_BACKEND."""
+    def decorator(cls):
+        STORAGE_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+@register_storage('local')
+class LocalStorage:
+    """Objects are plain files under STORAGE_ROOT; uploads are staged in .tmp on the same disk."""
+
+    def __init__(self, config):
+        self.root = os.path.abspath(config['STORAGE_ROOT'])
+        self.staging = os.path.join(self.root, '.tmp')
+        os.makedirs(self.staging, exist_ok=True)
+
+    def staging_path(self):
+        return os.path.join(self.staging, uuid.uuid4().hex)
+
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def put_file(self, src_path, key):
+        """Moves a staged file into place; os.replace keeps readers from seeing partial files."""
+        dst_path = self.local_path(key)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        os.replace(src_path, dst_path)
+
+    def touch(self, key):
+        os.utime(self.local_path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        """Yields (key, size, mtime) for every stored object."""
+        for top in sorted(os.listdir(self.root)):
+            top_dir = os.path.join(self.root, top)
+            if top == '.tmp' or not os.path.isdir(top_dir):
+                continue
+            for sub in sorted(os.listdir(top_dir)):
+                sub_dir = os.path.join(top_dir, sub)
+                for entry in os.scandir(sub_dir):
+                    if entry.is_file():
+                        stat = entry.stat()
+                        yield f'{top}/{sub}/{entry.name}', stat.st_size, stat.st_mtime
+
+
+@register_storage('s3')
+class S3Storage:
+    """Objects live in an S3-compatible bucket (AWS, MinIO, ...).
+
+    OCR and preprocessing need a file on disk, so local_path() downloads
+    into STORAGE_CACHE_DIR on first use; derivatives made from that copy
+    stay in the cache.
+    """
+
+    def __init__(self, config):
+        # Imported lazily so boto3 is only needed when this backend is selected
+        import boto3
+        self.client = boto3.client('s3', endpoint_url=config['STORAGE_S3_ENDPOINT_URL'])
+        self.bucket = config['STORAGE_S3_BUCKET']
+        self.prefix = config['STORAGE_S3_PREFIX']
+        self.cache_dir = os.path.abspath(config['STORAGE_CACHE_DIR'])
+        os.makedirs(os.path.join(self.cache_dir, '.tmp'), exist_ok=True)
+
+    def staging_path(self):
+        return os.path.join(self.cache_dir, '.tmp', uuid.uuid4().hex)
+
+    def local_path(self, key):
+        path = os.path.join(self.cache_dir, key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = self.staging_path()
+            self.client.download_file(self.bucket, self.prefix + key, tmp_path)
+            os.replace(tmp_path, path)
+        return path
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put_file(self, src_path, key):
+        self.client.upload_file(src_path, self.bucket, self.prefix + key)
+        # Keep the staged bytes as the local copy instead of downloading them again
+        cached = os.path.join(self.cache_dir, key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        os.replace(src_path, cached)
+
+    def touch(self, key):
+        # Copying an object onto itself refreshes LastModified
+        self.client.copy_object(Bucket=self.bucket, Key=self.prefix + key, MetadataDirective='REPLACE',
+                                CopySource={'Bucket': self.bucket, 'Key': self.prefix + key})
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+        try:
+            os.remove(os.path.join(self.cache_dir, key))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['Size'], item['LastModified'].timestamp()
+
+
+@dataclass
+class StoredImage:
+    key: str
+    sha256: str
+    size: int
+    deduplicated: bool  # the same bytes were already stored
+
+
+class ImageStore:
+    """Content-addressed store for uploaded solution images.
+
+    Each image is saved once under a key derived from its SHA-256, sharded
+    two levels deep (ab/cd/abcd...) so no directory grows without bound.
+    Uploading the same bytes again reuses the stored object, and derivatives
+    (thumbnails, the preprocessed OCR copy) sit next to it under the same
+    hash. Submission.image_path holds the key; compact() deletes objects
+    that no submission or profile references any more.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.thumbnails = True
+        self.thumbnail_edge = 256
+        self.orphan_grace = 24 * 3600
+
+    def init_app(self, app):
+        name = app.config['STORAGE_BACKEND']
+        if name not in STORAGE_BACKENDS:
+            raise ValueError(f"Unknown storage backend '{name}'; choose from {sorted(STORAGE_BACKENDS)}")
+        self.backend = STORAGE_BACKENDS[name](app.config)
+        self.thumbnails = app.config['THUMBNAIL_ENABLED']
+        self.thumbnail_edge = app.config['THUMBNAIL_MAX_EDGE']
+        self.orphan_grace = app.config['STORAGE_ORPHAN_GRACE_SECONDS']
+
+    @staticmethod
+    def key_for(sha, suffix):
+        return f'{sha[:2]}/{sha[2:4]}/{sha}{suffix}'
+
+    @staticmethod
+    def thumbnail_key(key):
+        match = KEY_PATTERN.match(key)
+        return ImageStore.key_for(match.group(1), '.thumb.jpg')
+
+    def save_upload(self, file):
+        """Stores an uploaded FileStorage; returns a StoredImage. Raises UploadTooLarge."""
+        return self.save_stream(file.stream, file.filename)
+
+    def save_stream(self, stream, filename):
+        staging_path = self.backend.staging_path()
+        sha, size = image_pipeline.save_stream(stream, staging_path)
+
+        extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        key = self.key_for(sha, EXTENSIONS.get(extension, '.img'))
+        if self.backend.exists(key):
+            os.remove(staging_path)
+            # Restart the orphan grace period so compaction cannot race the new reference
+            self.backend.touch(key)
+            return StoredImage(key, sha, size, True)
+
+        self.backend.put_file(staging_path, key)
+        if self.thumbnails:
+            try:
+                self._make_thumbnail(key)
+            except Exception as e:
+                # Thumbnails are a convenience; the upload itself succeeded
+                print(f"Error creating thumbnail for {key}: {str(e)}")
+        return StoredImage(key, sha, size, False)
+
+    def _make_thumbnail(self, key):
+        staging_path = self.backend.staging_path()
+        with Image.open(self.backend.local_path(key)) as img:
+            img.draft('RGB', (self.thumbnail_edge, self.thumbnail_edge))
+            img = ImageOps.exif_transpose(img).convert('RGB')
+            img.thumbnail((self.thumbnail_edge, self.thumbnail_edge))
+            img.save(staging_path, format='JPEG', quality=80)
+        self.backend.put_file(staging_path, self.thumbnail_key(key))
+
+    def local_path(self, key):
+        """Filesystem path of a stored object, for Pillow and the OCR pipeline."""
+        return self.backend.local_path(key)
+
+    def is_key(self, value):
+        return bool(value) and KEY_PATTERN.match(value) is not None
+
+    def referenced_hashes(self, batch_size=10000):
+        """SHA-256s of every image a submission or profile still points at."""
+        from models.problem import Submission
+        from models.user import User
+
+        hashes = set()
+        for column in (Submission.image_path, Submission.image_paths, User.profile_image):
+            rows = db.session.query(column).filter(column.isnot(None)).distinct().yield_per(batch_size)
+            for (value,) in rows:
+                hashes.update(KEY_HASH.findall(value))
+        return hashes
+
+    def compact(self, dry_run=False, grace_seconds=None):
+        """Deletes stored objects (and their derivatives) that nothing references.
+
+        Objects younger than the grace period are kept, so an upload whose
+        submission row is not committed yet is never collected.
+        """
+        grace = self.orphan_grace if grace_seconds is None else grace_seconds
+        referenced = self.referenced_hashes()
+        cutoff = time.time() - grace
+        stats = {'scanned': 0, 'deleted': 0, 'bytes_freed': 0, 'kept_recent': 0}
+
+        for key, size, mtime in list(self.backend.list()):
+            stats['scanned'] += 1
+            match = KEY_PATTERN.match(key)
+            if match is None or match.group(1) in referenced:
+                continue
+            if mtime > cutoff:
+                stats['kept_recent'] += 1
+                continue
+            if not dry_run:
+                self.backend.delete(key)
+            stats['deleted'] += 1
+            stats['bytes_freed'] += size
+        return stats
+
+
+image_store = ImageStore()
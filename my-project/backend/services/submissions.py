@@ -0,0 +1,124 @@
+import json
+
+from sqlalchemy import case, inspect, text, update
+
+from extensions import db
+from models.problem import Submission
+from services.verdict import SCORES, parse_verdict
+
+# Columns the history endpoints may return; model_output is left out on purpose
+SUBMISSION_FIELDS = ('submission_id', 'problem_id', 'user_id', 'status', 'verdict', 'answer_matches',
+                     'is_correct', 'score', 'latency_ms', 'ocr_text', 'image_path', 'submitted_at')
+
+
+def result_columns(final_state, timings=None):
+    """Typed Submission columns for a finished grading.
+
+    timings defaults to the stage timings kept in the state; latency_ms is
+    their sum (parallel pages count once, at the slowest page).
+    """
+    final_state = final_state or {}
+    verdict = parse_verdict(final_state.get('final_output'))
+    timings = final_state.get('timings') if timings is None else timings
+    return {
+        'verdict': verdict[0] if verdict else None,
+        'answer_matches': verdict[1] if verdict else None,
+        'is_correct': verdict == ('CORRECT', True) if verdict else None,
+        'score': SCORES[verdict] if verdict else None,
+        'ocr_text': final_state.get('ocr_output'),
+        'latency_ms': int(round(sum(timings.values()))) if timings else None,
+    }
+
+
+def apply_result(submission, final_state, timings=None):
+    for column, value in result_columns(final_state, timings).items():
+        setattr(submission, column, value)
+
+
+def row_json(row):
+    data = row._asdict()
+    if data.get('submitted_at') is not None:
+        data['submitted_at'] = data['submitted_at'].isoformat()
+    return data
+
+
+def ensure_schema():
+    """Adds Submission columns and indexes an older database is missing; returns what it added.
+
+    init-db (create_all) only creates missing tables, so databases created
+    before these columns existed are upgraded here. Columns keep their
+    default and NOT NULL, and rows from before the status column are marked
+    done (graded) or failed, so backfill, rebuild-stats and replay-ratings
+    see them.
+    """
+    table = Submission.__table__
+    inspector = inspect(db.engine)
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    added = []
+    with db.engine.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing:
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl(column, connection.dialect)}'))
+                added.append(column.name)
+        # Every row predates the status column if it was just added; NULLs are
+        # left by upgrades made before column defaults were carried over
+        legacy = update(table) if 'status' in added else update(table).where(Submission.status.is_(None))
+        connection.execute(legacy.values(status=case((Submission.model_output.isnot(None), 'done'), else_='failed')))
+        connection.execute(update(table).where(Submission.attempts.is_(None)).values(attempts=0))
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    return added
+
+
+def column_ddl(column, dialect):
+    """'name TYPE [DEFAULT x NOT NULL]' for ALTER TABLE ADD COLUMN."""
+    ddl = f'{column.name} {column.type.compile(dialect=dialect)}'
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT {db.literal(default).compile(dialect=dialect, compile_kwargs={'literal_binds': True})}"
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
+
+
+def backfill(batch_size=1000, force=False, progress=None):
+    """Fills the typed columns of graded submissions from their stored model_output.
+
+    Walks the table once in submission_id order, one batch per transaction,
+    so it can run against a live database and be resumed by running it
+    again. Without force, rows that already have a verdict are skipped.
+    """
+    stats = {'scanned': 0, 'updated': 0, 'unparsed': 0}
+    last_id = 0
+    while True:
+        query = (db.session.query(Submission.submission_id, Submission.model_output)
+                 .filter(Submission.submission_id > last_id,
+                         Submission.status == 'done',
+                         Submission.model_output.isnot(None)))
+        if not force:
+            query = query.filter(Submission.verdict.is_(None))
+        batch = query.order_by(Submission.submission_id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].submission_id
+
+        rows = []
+        for submission_id, model_output in batch:
+            try:
+                columns = result_columns(json.loads(model_output))
+            except ValueError:
+                columns = None
+            if columns is None or columns['verdict'] is None:
+                stats['unparsed'] += 1
+            if columns is not None:
+                rows.append({'submission_id': submission_id, **columns})
+
+        if rows:
+            # Executemany UPDATE keyed by the primary key
+            db.session.execute(update(Submission), rows)
+        db.session.commit()
+        stats['scanned'] += len(batch)
+        stats['updated'] += len(rows)
+        if progress:
+            progress(stats, last_id)
+    return stats
@@ -0,0 +1,40 @@
+import re
+
+# "The human's solution approach is **CORRECT** and the final answer **MATCHES** ..."
+APPROACH = re.compile(r'approach is\W*(PARTIALLY CORRECT|INCORRECT|CORRECT|NOT CHECKED)\b', re.IGNORECASE)
+ANSWER = re.compile(r'\W(DOES NOT MATCH|MATCHES)\b', re.IGNORECASE)
+
+# Credit per outcome, mirroring the 10 / 7 / 5 / -3 point scheme in the UI
+SCORES = {
+    ('CORRECT', True): 1.0,
+    ('PARTIALLY CORRECT', True): 0.7,
+    ('PARTIALLY CORRECT', False): 0.7,
+    ('INCORRECT', True): 0.5,
+    ('CORRECT', False): 0.5,
+    ('INCORRECT', False): 0.0,
+    ('NOT CHECKED', True): 0.7,  # local answer check only: the working was never reviewed
+}
+
+
+def parse_verdict(final_output):
+    """Extracts (approach, answer_matches) from the compare step's text.
+
+    approach is 'CORRECT', 'PARTIALLY CORRECT', 'INCORRECT', or 'NOT CHECKED'
+    when only the final answer was checked locally; returns None
+    when the model did not state a verdict in the expected form.
+    """
+    if not final_output:
+        return None
+
+    # The verdict is the conclusion, so trust the last statement in the text
+    approaches = APPROACH.findall(final_output)
+    answers = ANSWER.findall(final_output)
+    if not approaches or not answers:
+        return None
+    return approaches[-1].upper(), answers[-1].upper() == 'MATCHES'
+
+
+def verdict_score(final_output):
+    """Returns a 0..1 credit for the submission, or None if there is no verdict."""
+    verdict = parse_verdict(final_output)
+    return SCORES[verdict] if verdict else None
@@ -0,0 +1,103 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Prefix the OCR prompt asks the model to start with; it carries no answer content
+OCR_PREFIX = re.compile(r'^\s*thus the parsed text is:?', re.IGNORECASE)
+
+# Look-alike characters handwriting OCR tends to produce for the same symbol
+CHAR_MAP = str.maketrans({
+    '−': '-',  # minus sign
+    '–': '-',  # en dash
+    '—': '-',  # em dash
+    '×': '*',  # multiplication sign
+    '·': '*',  # middle dot
+    '÷': '/',  # division sign
+})
+
+
+def canonicalize(text):
+    """Normalizes a transcription so trivially different renderings share a key."""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = OCR_PREFIX.sub('', text).translate(CHAR_MAP).lower()
+    text = re.sub(r'\*\*|`', '', text)  # markdown emphasis from the model
+    return re.sub(r'\s+', '', text)
+
+
+class VerdictCache:
+    """In-memory LRU of compare verdicts with a TTL.
+
+    Keys combine the canonical transcription, the problem ID and a version
+    derived from the compare prompt and the system solution, so editing
+    either one invalidates old verdicts without an explicit flush.
+    """
+
+    def __init__(self):
+        self.ttl = 0
+        self.max_entries = 0
+        self.version = ''
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, verdict)
+
+    def init_app(self, app):
+        self.ttl = app.config['VERDICT_CACHE_TTL']
+        self.max_entries = app.config['VERDICT_CACHE_MAX_ENTRIES']
+        self.version = app.config['VERDICT_CACHE_VERSION']
+
+    def make_key(self, transcription, problem_id, system_ans, prompt):
+        version = hashlib.sha256(
+            f'{self.version}\0{prompt}\0{system_ans}'.encode('utf-8')
+        ).hexdigest()[:16]
+        answer = hashlib.sha256(canonicalize(transcription).encode('utf-8')).hexdigest()
+        return f'{problem_id}:{version}:{answer}'
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, verdict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, problem_id=None):
+        """Drops every verdict, or only those for one problem."""
+        with self._lock:
+            if problem_id is None:
+                self._entries.clear()
+                return
+            prefix = f'{problem_id}:'
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+verdict_cache = VerdictCache()
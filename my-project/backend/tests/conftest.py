@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from app import create_app
+from config import Config
+from extensions import db
+from models.user import User
+
+# Two questions per level 1-5, alternating topics
+QUESTIONS = [{
+    'Question ID': f'question-{i}',
+    'Level': f'Level {(i - 1) // 2 + 1}',
+    'Topic': 'Algebra' if i % 2 else 'Geometry',
+    'Problem': f'Problem {i}',
+    'Solution': f'\\boxed{{{i}}}',
+} for i in range(1, 11)]
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh SQLite file with the offline model backends."""
+    questions = tmp_path / 'questions.json'
+    questions.write_text(json.dumps(QUESTIONS))
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        QUESTIONS_FILE = str(questions)
+        STORAGE_BACKEND = 'local'
+        STORAGE_ROOT = str(tmp_path / 'objects')
+        STORAGE_CACHE_DIR = str(tmp_path / 'cache')
+        OCR_CACHE_DIR = str(tmp_path / 'ocr')
+        OCR_MODEL_BACKEND = 'fake'
+        COMPARE_MODEL_BACKEND = 'fake'
+        FAKE_MODEL_LATENCY = 0.0
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username='user', rating=0.0):
+        user = User(username=username, password='', rating_score=rating)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
@@ -0,0 +1,52 @@
+import pytest
+
+from services.answer_check import answer_checker, extract_final_answer
+from services.verdict import parse_verdict, verdict_score
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Thus the parsed text is: x + 2 = 7\n\\boxed{5}', '5'),
+    ('2x = 10\nTherefore x = 5', 'x = 5'),
+    ('2x = 10\nx = 5', '5'),
+    ('Final answer: 3/4', '3/4'),
+])
+def test_final_answer_is_extracted(text, expected):
+    assert extract_final_answer(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'x^2 - 4 = 0',            # an equation still to be solved, not an answer
+    '2x + 3 = 7',
+    'a = b = 4',
+    'I am not sure how to finish',
+    '',
+])
+def test_working_is_not_mistaken_for_an_answer(text):
+    assert extract_final_answer(text) is None
+
+
+def test_unsolved_equation_is_left_to_the_model(app):
+    assert answer_checker.check('question-4', 'x^2 - 4 = 0', '\\boxed{2}') == {'outcome': 'unparsed'}
+
+
+@pytest.mark.parametrize('human, solution, method', [
+    ('x = 5', '\\boxed{5}', 'exact'),
+    ('Answer: 0.5', '\\boxed{\\frac{1}{2}}', 'numeric'),
+    ('x = -3, -2', '\\boxed{-2, -3}', 'exact'),
+])
+def test_equal_answers_match(app, human, solution, method):
+    result = answer_checker.check(f'question-{method}-{human}', human, solution)
+    assert result['outcome'] == 'match'
+    assert result['method'] == method
+
+
+def test_different_answer_is_a_mismatch(app):
+    assert answer_checker.check('question-1', 'x = 6', '\\boxed{5}')['outcome'] == 'mismatch'
+
+
+def test_local_match_gets_its_own_verdict_and_credit(app):
+    result = answer_checker.check('question-1', 'x = 5', '\\boxed{5}')
+    verdict = answer_checker.verdict(result)
+
+    assert parse_verdict(verdict) == ('NOT CHECKED', True)
+    assert verdict_score(verdict) == 0.7
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models.problem import GradingWorker, Submission
+from services.grading_queue import grading_queue
+
+
+def add_submission(worker_id, status='running', age_seconds=600):
+    submission = Submission(problem_id='question-1', user_id=1, status=status, worker_id=worker_id,
+                            submitted_at=datetime.utcnow() - timedelta(seconds=age_seconds))
+    db.session.add(submission)
+    db.session.commit()
+    return submission.submission_id
+
+
+def status_of(submission_id):
+    db.session.expire_all()
+    return db.session.get(Submission, submission_id).status
+
+
+def test_recover_stale_fails_only_rows_of_dead_or_unknown_workers(app):
+    now = datetime.utcnow()
+    db.session.add_all([GradingWorker(worker_id='live', heartbeat_at=now),
+                        GradingWorker(worker_id='dead', heartbeat_at=now - timedelta(hours=1))])
+    db.session.commit()
+    live = add_submission('live')
+    dead = add_submission('dead', status='queued')
+    orphan = add_submission(None)
+    recent = add_submission(None, age_seconds=0)
+
+    assert grading_queue.recover_stale() == 2
+
+    assert status_of(live) == 'running'
+    assert status_of(dead) == 'failed'
+    assert status_of(orphan) == 'failed'
+    assert status_of(recent) == 'running'
+    assert db.session.get(GradingWorker, 'dead') is None
+
+
+def test_heartbeat_keeps_this_process_rows_alive(app):
+    grading_queue.heartbeat()
+    own = add_submission(grading_queue.worker_id)
+
+    assert grading_queue.recover_stale() == 0
+    assert status_of(own) == 'running'
+
+
+def test_late_result_does_not_overwrite_a_failed_row(app):
+    submission_id = add_submission('dead')
+    grading_queue.recover_stale()
+
+    final_state = {'final_output': "approach is **CORRECT** and the final answer **MATCHES**"}
+    grading_queue._save_result(submission_id, final_state, 1, None, {})
+
+    db.session.expire_all()
+    submission = db.session.get(Submission, submission_id)
+    assert submission.status == 'failed'
+    assert submission.model_output is None
@@ -0,0 +1,49 @@
+from extensions import db
+from models.problem import Submission
+from services.leaderboard import leaderboard
+from services.rating import rating_engine
+
+CORRECT = "The human's solution approach is **CORRECT** and the final answer **MATCHES** the system's answer."
+
+
+def test_ranks_follow_rating_with_ties_sharing_a_rank(app, make_user):
+    alice = make_user('alice', 50.0)
+    bob = make_user('bob', 20.0)
+    carol = make_user('carol', 20.0)
+
+    total, entries = leaderboard.page(0, 10)
+    assert total == 3
+    assert [(e['username'], e['rank']) for e in entries] == [('alice', 1), ('bob', 2), ('carol', 2)]
+    assert leaderboard.rank(carol.userid) == (2, 20.0, 3)
+    assert leaderboard.rank(alice.userid)[0] == 1
+    assert leaderboard.rank(bob.userid)[0] == 2
+
+
+def rate(user):
+    submission = Submission(problem_id='question-1', user_id=user.userid, status='done')
+    db.session.add(submission)
+    rating_engine.rate_submission(submission, CORRECT)
+
+
+def test_rating_change_reaches_the_leaderboard_only_after_commit(app, make_user):
+    leader = make_user('leader', 10.0)
+    user = make_user('user', 0.0)
+    leaderboard.page(0, 10)  # load the cache
+
+    rate(user)
+    assert leaderboard.rank(user.userid)[0] == 2
+    db.session.commit()
+    assert leaderboard.rank(user.userid) == (1, 16.0, 2)
+    assert leaderboard.rank(leader.userid)[0] == 2
+
+
+def test_rolled_back_rating_change_never_reaches_the_leaderboard(app, make_user):
+    make_user('leader', 10.0)
+    user = make_user('user', 0.0)
+    leaderboard.page(0, 10)
+
+    rate(user)
+    db.session.rollback()
+    db.session.commit()
+
+    assert leaderboard.rank(user.userid) == (2, 0.0, 2)
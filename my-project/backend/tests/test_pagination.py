@@ -0,0 +1,45 @@
+from extensions import db
+from models.problem import Problem
+
+
+def add_problems(count):
+    db.session.add_all([Problem(title=f'Problem {i}', content='x' * 100, difficulty=1 + i % 5,
+                                topic='algebra' if i % 2 else 'geometry') for i in range(count)])
+    db.session.commit()
+
+
+def test_problems_are_paged_by_cursor_until_exhausted(app):
+    add_problems(5)
+    client = app.test_client()
+
+    first = client.get('/problems?limit=2')
+    assert [row['problem_id'] for row in first.get_json()] == [1, 2]
+    assert first.headers['X-Next-Cursor'] == '2'
+
+    second = client.get('/problems?limit=2&after=2')
+    assert [row['problem_id'] for row in second.get_json()] == [3, 4]
+
+    last = client.get('/problems?limit=2&after=4')
+    assert [row['problem_id'] for row in last.get_json()] == [5]
+    assert 'X-Next-Cursor' not in last.headers
+
+
+def test_problems_filter_and_project_fields(app):
+    add_problems(6)
+    response = app.test_client().get('/problems?topic=algebra&fields=title')
+
+    rows = response.get_json()
+    assert [row['problem_id'] for row in rows] == [2, 4, 6]
+    assert all(set(row) == {'problem_id', 'title'} for row in rows)
+
+
+def test_unknown_field_is_rejected(app):
+    assert app.test_client().get('/problems?fields=password').status_code == 400
+
+
+def test_unchanged_page_answers_304(app):
+    add_problems(2)
+    client = app.test_client()
+    etag = client.get('/problems').headers['ETag']
+
+    assert client.get('/problems', headers={'If-None-Match': etag}).status_code == 304
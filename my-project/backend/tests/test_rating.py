@@ -0,0 +1,57 @@
+import pytest
+
+from extensions import db
+from models.problem import Submission
+from models.rating_history import RatingHistory
+from services.rating import rating_engine
+
+CORRECT = "The human's solution approach is **CORRECT** and the final answer **MATCHES** the system's answer."
+INCORRECT = "The human's solution approach is **INCORRECT** and the final answer **DOES NOT MATCH** the system's answer."
+
+
+def test_next_rating_moves_by_k_times_surprise(app):
+    # A difficulty-1 problem is rated like a new user, so the expected score is 0.5
+    assert rating_engine.next_rating(0.0, 1, 1.0) == pytest.approx(16.0)
+    assert rating_engine.next_rating(0.0, 1, 0.0) == pytest.approx(-16.0)
+    # Beating a harder problem earns more than beating an easy one
+    assert rating_engine.next_rating(0.0, 5, 1.0) > rating_engine.next_rating(0.0, 1, 1.0)
+
+
+def test_difficulty_comes_from_the_question_level(app):
+    assert rating_engine.difficulty_for('question-9') == 5
+    assert rating_engine.difficulty_for('question-999') == rating_engine.default_difficulty
+
+
+def test_rate_submission_updates_rating_and_history(app, make_user):
+    user = make_user()
+    submission = Submission(problem_id='question-1', user_id=user.userid, status='done')
+    db.session.add(submission)
+
+    assert rating_engine.rate_submission(submission, CORRECT) == 16.0
+    db.session.commit()
+
+    assert user.rating_score == 16.0
+    assert [row.rating for row in RatingHistory.query.filter_by(user_id=user.userid)] == [16.0]
+
+
+def test_submission_without_verdict_is_not_rated(app, make_user):
+    user = make_user()
+    submission = Submission(problem_id='question-1', user_id=user.userid, status='done')
+
+    assert rating_engine.rate_submission(submission, 'no verdict here') is None
+    assert user.rating_score == 0.0
+
+
+def test_replay_matches_incremental_updates(app, make_user):
+    user = make_user()
+    for output in (CORRECT, INCORRECT, CORRECT):
+        submission = Submission(problem_id='question-5', user_id=user.userid, status='done',
+                                model_output='{"final_output": "%s"}' % output.replace('"', '\\"'))
+        db.session.add(submission)
+        rating_engine.rate_submission(submission, output)
+        db.session.commit()
+    incremental = user.rating_score
+
+    assert rating_engine.replay()['submissions'] == 3
+    db.session.expire_all()
+    assert db.session.get(type(user), user.userid).rating_score == incremental
@@ -0,0 +1,61 @@
+from extensions import db
+from models.problem import Submission
+from services.recommender import question_recommender
+
+
+def levels(questions):
+    return {question['Level'] for question in questions}
+
+
+def test_explicit_level_is_never_widened(app):
+    # Level 2 has only two questions; asking for more must not pull in levels 1 or 3
+    picked = question_recommender.recommend(count=6, level=2)
+
+    assert levels(picked) == {'Level 2'}
+    assert len(picked) == 2
+
+    response = app.test_client().get('/api/get-questions?level=2&count=6')
+    assert levels(response.get_json()) == {'Level 2'}
+
+
+def test_explicit_level_repeats_attempted_questions_rather_than_widening(app, make_user):
+    user = make_user()
+    db.session.add_all([Submission(problem_id='question-3', user_id=user.userid, status='done'),
+                        Submission(problem_id='question-4', user_id=user.userid, status='done')])
+    db.session.commit()
+
+    picked = question_recommender.recommend(user.userid, count=2, level=2)
+    assert sorted(q['Question ID'] for q in picked) == ['question-3', 'question-4']
+
+
+def test_inferred_level_widens_to_neighbours(app, make_user):
+    user = make_user(rating=0.0)  # closest to the level 1 problems
+    picked = question_recommender.recommend(user.userid, count=4)
+
+    assert len(picked) == 4
+    assert levels(picked) == {'Level 1', 'Level 2'}
+
+
+def test_attempted_questions_are_skipped(app, make_user):
+    user = make_user()
+    db.session.add(Submission(problem_id='question-1', user_id=user.userid, status='done'))
+    db.session.commit()
+
+    for _ in range(5):
+        picked = question_recommender.recommend(user.userid, count=1, level=1)
+        assert [q['Question ID'] for q in picked] == ['question-2']
+
+
+def test_new_submission_is_skipped_without_a_reload(app, make_user):
+    user = make_user()
+    question_recommender.recommend(user.userid, count=1, level=1)  # loads the user's history
+    question_recommender.mark_attempted(user.userid, 'question-2')
+
+    for _ in range(5):
+        picked = question_recommender.recommend(user.userid, count=1, level=1)
+        assert [q['Question ID'] for q in picked] == ['question-1']
+
+
+def test_topic_filter(app):
+    picked = question_recommender.recommend(count=2, level=3, topic='geometry')
+    assert [q['Question ID'] for q in picked] == ['question-6']
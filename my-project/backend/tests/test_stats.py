@@ -0,0 +1,45 @@
+from extensions import db
+from models.problem import Submission
+from services.stats import submission_stats
+from services.submissions import apply_result
+
+CORRECT = "The human's solution approach is **CORRECT** and the final answer **MATCHES** the system's answer."
+PARTIAL = "The human's solution approach is **PARTIALLY CORRECT** and the final answer **MATCHES** the system's answer."
+INCORRECT = "The human's solution approach is **INCORRECT** and the final answer **DOES NOT MATCH** the system's answer."
+
+
+def grade(user, problem_id, output, latency_ms):
+    submission = Submission(problem_id=problem_id, user_id=user.userid, status='done')
+    apply_result(submission, {'final_output': output}, {} if latency_ms is None else {'ocr': latency_ms})
+    db.session.add(submission)
+    submission_stats.record(submission)
+    db.session.commit()
+
+
+def test_counters_add_up_per_problem_and_per_user_facet(app, make_user):
+    user = make_user()
+    grade(user, 'question-1', CORRECT, 100)
+    grade(user, 'question-1', PARTIAL, 300)
+    grade(user, 'question-2', INCORRECT, 200)
+
+    problem = submission_stats.problem('question-1').to_dict()
+    assert problem == {'attempts': 2, 'correct': 1, 'partial': 1, 'incorrect': 0,
+                       'solve_rate': 0.5, 'average_score': 0.85, 'average_latency_ms': 200.0}
+
+    stats = submission_stats.user(user.userid)
+    assert stats['topic']['algebra']['attempts'] == 2
+    assert stats['topic']['geometry']['incorrect'] == 1
+    assert stats['difficulty']['1']['attempts'] == 3
+
+
+def test_rebuild_reproduces_the_incremental_counters(app, make_user):
+    user = make_user()
+    grade(user, 'question-1', CORRECT, 100)
+    grade(user, 'question-3', INCORRECT, 50)
+    grade(user, 'question-3', PARTIAL, None)
+    before = (submission_stats.problem('question-3').to_dict(), submission_stats.user(user.userid))
+
+    assert submission_stats.rebuild() == {'problems': 2, 'user_rows': 3}
+
+    db.session.expire_all()
+    assert (submission_stats.problem('question-3').to_dict(), submission_stats.user(user.userid)) == before
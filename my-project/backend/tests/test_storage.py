@@ -0,0 +1,45 @@
+import hashlib
+import io
+import os
+
+from PIL import Image
+
+from extensions import db
+from models.problem import Submission
+from services.storage import image_store
+
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_same_bytes_are_stored_once_under_their_hash(app):
+    photo = jpeg('red')
+    sha = hashlib.sha256(photo).hexdigest()
+
+    first = image_store.save_stream(io.BytesIO(photo), 'page.JPEG')
+    second = image_store.save_stream(io.BytesIO(photo), 'other-name.jpg')
+
+    assert first.key == second.key == f'{sha[:2]}/{sha[2:4]}/{sha}.jpg'
+    assert (first.deduplicated, second.deduplicated) == (False, True)
+    assert first.size == len(photo)
+    assert open(image_store.local_path(first.key), 'rb').read() == photo
+    assert os.path.exists(image_store.local_path(image_store.thumbnail_key(first.key)))
+
+
+def test_compact_deletes_only_unreferenced_objects(app):
+    kept = image_store.save_stream(io.BytesIO(jpeg('red')), 'kept.jpg')
+    orphan = image_store.save_stream(io.BytesIO(jpeg('blue')), 'orphan.jpg')
+    db.session.add(Submission(problem_id='question-1', image_path=kept.key, status='done'))
+    db.session.commit()
+
+    # Young orphans are kept until the grace period has passed
+    assert image_store.compact()['deleted'] == 0
+
+    stats = image_store.compact(grace_seconds=0)
+    assert stats['deleted'] == 2  # the orphan and its thumbnail
+    assert os.path.exists(image_store.local_path(kept.key))
+    assert os.path.exists(image_store.local_path(image_store.thumbnail_key(kept.key)))
+    assert not os.path.exists(image_store.local_path(orphan.key))
@@ -0,0 +1,11 @@
+"""Production entry point, e.g.
+
+    gunicorn --preload --workers 4 --bind 0.0.0.0:5000 wsgi:app
+
+With --preload the app is built once in the master and forked; model clients
+and database connections are created lazily in each worker process, and
+gunicorn.conf.py starts each worker's grading threads and heartbeat.
+"""
+from app import create_app
+
+app = create_app()
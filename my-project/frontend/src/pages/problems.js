@@ -1,5 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
+import api from '../services/api';
+import authService from '../services/auth';
 import 'katex/dist/katex.min.css'; // Import KaTeX CSS
 import katex from 'katex';
 
@@ -76,10 +78,13 @@ const ProblemsPage = () => {
     const fetchQuestions = async () => {
       try {
         setLoading(true);
-        const response = await axios.get('http://localhost:5000/api/get-questions', {
-          params: { level: Math.max(Math.floor(points/20) + 1, 1) },
-        });
-        console.log(points);
+        // Logged-in users get questions near their rating that they have not tried yet;
+        // otherwise fall back to a level from the points earned on this device
+        const user = authService.getCurrentUser();
+        const params = user
+          ? { user_id: user.userid }
+          : { level: Math.max(Math.floor(points/20) + 1, 1) };
+        const response = await axios.get('http://localhost:5000/api/get-questions', { params });
         setQuestions(response.data);
       } catch (err) {
         console.error('Error fetching questions:', err);
@@ -161,6 +166,7 @@ const ProblemsPage = () => {
     
     const results = {};
     let pointsChange = 0; // Track points earned/lost in this submission
+    const user = authService.getCurrentUser();
     
     try {
       // Submit each uploaded solution
@@ -182,15 +188,17 @@ const ProblemsPage = () => {
         const formData = new FormData();
         formData.append('file', file);
         formData.append('problem_id', questionId);
-        formData.append('user_id', '1'); // Replace with actual user ID
+        formData.append('user_id', user ? user.userid : '1'); // '1' when nobody is logged in
         
         try {
           // Use the submit endpoint
-          const response = await axios.post(
+          const queued = await axios.post(
             `http://localhost:5000/problems/${parsedId}/submit`, 
             formData,
             { headers: { 'Content-Type': 'multipart/form-data' } }
           );
+          // Grading happens in the background; poll until the result is ready
+          const response = { data: await api.waitForSubmission(queued.data.submission_id) };
           console.log(response)
           // Store the result
           results[index] = {
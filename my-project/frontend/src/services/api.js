@@ -2,12 +2,23 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:5000';
 
+// List endpoints return one page at a time; follow X-Next-Cursor until the last page
+const getAllPages = async (url, params = {}) => {
+  const rows = [];
+  let after = null;
+  do {
+    const response = await axios.get(url, { params: after === null ? params : { ...params, after } });
+    rows.push(...response.data);
+    after = response.headers['x-next-cursor'] ?? null;
+  } while (after !== null);
+  return rows;
+};
+
 const api = {
   // Get all users
   getUsers: async () => {
     try {
-      const response = await axios.get(`${API_URL}/users`);
-      return response.data;
+      return await getAllPages(`${API_URL}/users`);
     } catch (error) {
       console.error('Error fetching users:', error);
       throw error;
@@ -71,6 +82,17 @@ const api = {
     }
   },
 
+  // Get a user's submissions, newest first; pass the previous page's X-Next-Cursor as `after`
+  getUserSubmissions: async (userId, { after, limit } = {}) => {
+    try {
+      const response = await axios.get(`${API_URL}/users/${userId}/submissions`, { params: { after, limit } });
+      return { submissions: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+    } catch (error) {
+      console.error(`Error fetching submissions for user ${userId}:`, error);
+      throw error;
+    }
+  },
+
   // Upload user profile image
   uploadProfileImage: async (userId, imageFile) => {
     try {
@@ -96,12 +118,11 @@ const api = {
   // Get all problems with optional filtering
   getProblems: async (filters = {}) => {
     try {
-      const queryParams = new URLSearchParams();
-      if (filters.difficulty) queryParams.append('difficulty', filters.difficulty);
-      if (filters.type) queryParams.append('type', filters.type);
+      const params = {};
+      if (filters.difficulty) params.difficulty = filters.difficulty;
+      if (filters.type) params.type = filters.type;
 
-      const response = await axios.get(`${API_URL}/problems?${queryParams.toString()}`);
-      return response.data;
+      return await getAllPages(`${API_URL}/problems`, params);
     } catch (error) {
       console.error('Error fetching problems:', error);
       throw error;
@@ -119,11 +140,11 @@ const api = {
     }
   },
 
-  // Submit a solution with image
-  submitSolution: async (problemId, userId, imageFile) => {
+  // Submit a solution with one image, or an array of images (one per page, in order)
+  submitSolution: async (problemId, userId, imageFiles) => {
     try {
       const formData = new FormData();
-      formData.append('file', imageFile);
+      [].concat(imageFiles).forEach((imageFile) => formData.append('file', imageFile));
       formData.append('user_id', userId);
 
       const response = await axios.post(
@@ -135,13 +156,86 @@ const api = {
           },
         }
       );
-      return response.data;
+      // Grading runs in the background; wait for the result
+      return await api.waitForSubmission(response.data.submission_id);
     } catch (error) {
       console.error(`Error submitting solution for problem ${problemId}:`, error);
       throw error;
     }
   },
 
+  // Submit a solution and receive grading as it happens (Server-Sent Events).
+  // onEvent(name, data) sees 'submitted', 'ocr_page', 'ocr', 'token', 'queued', 'done' and 'error'.
+  streamSolution: async (problemId, userId, imageFiles, onEvent) => {
+    const formData = new FormData();
+    [].concat(imageFiles).forEach((imageFile) => formData.append('file', imageFile));
+    formData.append('user_id', userId);
+
+    // EventSource cannot POST, so read the event stream with fetch
+    const response = await fetch(`${API_URL}/problems/${problemId}/submit?stream=1`, {
+      method: 'POST',
+      body: formData,
+    });
+    if (!response.ok) {
+      const body = await response.json().catch(() => ({}));
+      throw new Error(body.error || `Submission failed (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let submissionId = null;
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const name = block.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (onEvent) onEvent(name, data);
+
+        if (name === 'submitted') submissionId = data.submission_id;
+        if (name === 'error') throw new Error(data.error);
+        if (name === 'done' || name === 'queued') {
+          // Too many open streams falls back to background grading
+          return await api.waitForSubmission(submissionId);
+        }
+      }
+    }
+    throw new Error('Grading stream ended unexpectedly');
+  },
+
+  // Get the grading status of a submission
+  getSubmission: async (submissionId) => {
+    try {
+      const response = await axios.get(`${API_URL}/submissions/${submissionId}`);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching submission ${submissionId}:`, error);
+      throw error;
+    }
+  },
+
+  // Poll a submission until grading has finished, giving up after timeoutMs
+  waitForSubmission: async (submissionId, intervalMs = 1500, timeoutMs = 5 * 60 * 1000) => {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const submission = await api.getSubmission(submissionId);
+      if (submission.status === 'done') {
+        return submission;
+      }
+      if (submission.status === 'failed') {
+        throw new Error(submission.error || 'Grading failed');
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Grading is taking longer than expected, please check back later');
+  },
+
   // Upload a file (generic function for file uploads)
   uploadFile: async (formData) => {
     try {
@@ -1,12 +1,17 @@
-import json  # Import the json module
-import random  # Import the random module
+import os  # Import the os module
+import sys  # Import the sys module
+
+# Share the backend's parsed question bank instead of re-reading the file
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from services.question_bank import QuestionBank
+
+question_bank = QuestionBank(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'questions.json'))
 
 def get_random_question_by_level(level, count=1):
-    with open("questions.json", "r", encoding="utf-8") as json_file:
-        data = json.load(json_file)
-        
-    filtered_questions = [q for q in data if q["Level"] == level]
-    return [{"Problem": q["Problem"], "Solution": q["Solution"]} for q in random.sample(filtered_questions, min(count, len(filtered_questions)))] if filtered_questions else []
-
-# Example usage
-print(get_random_question_by_level("Level 3", 3))
\ No newline at end of file
+    # Accepts 'Level 3' as well as 3
+    level = str(level).replace('Level', '').strip()
+    return [{"Problem": q["Problem"], "Solution": q["Solution"]} for q in question_bank.sample_level(level, count)]
+
+if __name__ == '__main__':
+    # Example usage
+    print(get_random_question_by_level("Level 3", 3))